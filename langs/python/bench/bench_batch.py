@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Batch parsing throughput versus process-pool worker count
+
+Usage: python bench/bench_batch.py [--count N] [--chunksize N] [--workers 0,1,2,4]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clide import Clyde  # noqa: E402
+
+USAGE = [
+    "Usage: jobctl [-v|--verbose] run [--retries=INT:3] [--queue=STR:default] "
+    "[--tag=STR+] [--dry-run] <job:STR>",
+    "Usage: jobctl cancel [--force] <id:INT>",
+    "Usage: jobctl logs [--tail=INT:100] <id:INT>",
+]
+
+
+def make_argvs(count):
+    argvs = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            argvs.append(["run", "--retries", str(i % 7), "--tag=a", "--tag=b", f"job{i}"])
+        elif kind == 1:
+            argvs.append(["cancel", "--force", str(i)])
+        elif kind == 2:
+            argvs.append(["logs", "--tail=10", str(i)])
+        else:
+            argvs.append(["cancel", "not-an-int"])
+    return argvs
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--count", type=int, default=200_000)
+    ap.add_argument("--chunksize", type=int, default=2048)
+    ap.add_argument("--workers", default="0,1,2,4")
+    opts = ap.parse_args()
+
+    argvs = make_argvs(opts.count)
+    print(f"{'workers':>8} {'seconds':>10} {'argv/s':>12} {'errors':>8}")
+    for workers in (int(w) for w in opts.workers.split(",")):
+        start = time.perf_counter()
+        errors = 0
+        for item in Clyde.iter_parse(USAGE, argvs, workers=workers, chunksize=opts.chunksize):
+            if isinstance(item, Exception):
+                errors += 1
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {elapsed:>10.3f} {opts.count / elapsed:>12,.0f} {errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
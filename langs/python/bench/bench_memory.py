@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Peak memory of parsing xargs-style argvs
+
+Builds argvs of up to 1M paths after `--` and reports the tracemalloc peak
+and wall time of one parse, next to a copying reference that does what the
+parser used to (`argv[:]` plus slicing the rest into a new list). The argv
+itself is allocated before tracing starts, so the peak is what parsing adds.
+
+Usage: python bench/bench_memory.py [--sizes 1000,10000,100000,1000000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clide import Clyde  # noqa: E402
+
+USAGE = ["Usage: tool [--jobs=INT:4] <dir:PATH>"]
+
+
+def copying_reference(argv):
+    """The allocations of the old token loop: a full copy and a rest slice"""
+    args = argv[:]
+    i = args.index("--")
+    rest = args[i + 1:]
+    return rest[1:]
+
+
+def traced(fn, argv):
+    """(peak bytes, seconds) of one call, excluding the argv itself"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(argv)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000",
+                    help="comma-separated numbers of trailing paths")
+    opts = ap.parse_args()
+
+    parse = Clyde.from_usage_lines(USAGE)
+    print(f"{'paths':>9} {'parse peak':>12} {'parse ms':>9} {'copy peak':>12} {'copy ms':>9}")
+    for size in (int(s) for s in opts.sizes.split(",")):
+        argv = ["--jobs", "8", "--", "/work"] + [f"/data/file{n:07d}.txt" for n in range(size)]
+        parse_peak, parse_time = traced(parse, argv)
+        copy_peak, copy_time = traced(copying_reference, argv)
+        print(f"{size:>9} {parse_peak / 1024:>10.1f}KB {parse_time * 1000:>9.2f} "
+              f"{copy_peak / 1024:>10.1f}KB {copy_time * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
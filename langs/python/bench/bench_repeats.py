@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Repeatable options at high occurrence counts
+
+Parses `--id=N` repeated 10^3..10^6 times and reports time and tracemalloc
+peak for: the original option path (linear option searches and a list of
+(name, values) pairs grown with `add_opt`), the current untyped parser, the
+typed parser (values stored in array('q')), and the typed parser with an
+`on_repeat` callback that keeps memory bounded.
+
+Usage: python bench/bench_repeats.py [--max-exp 6]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clide import Clyde  # noqa: E402
+from clide.cache import compile_spec  # noqa: E402
+from clide.runtime import add_opt, parse_val  # noqa: E402
+from clide.spec import OptBool, OptVal  # noqa: E402
+
+USAGE = ["Usage: job [-v] [--retries=INT:0] [--name=STR] [--tag=STR+] [--id=INT+]"]
+
+
+def legacy(spec):
+    """The original option path: linear name and declaration searches,
+    parse_val per value and add_opt over a list of (name, values) pairs"""
+    atoms = [atom for item in spec.commands[0].items for atom in item.group.atoms_list()]
+    known = [a.long or a.short for a in atoms if isinstance(a, (OptBool, OptVal))]
+
+    def parse(argv):
+        opts = []
+        for arg in argv:
+            name, _, val = arg.partition("=")
+            if name not in known:
+                raise ValueError(name)
+            decl = next(a for a in atoms if isinstance(a, (OptBool, OptVal)) and
+                        (a.long == name or a.short == name))
+            add_opt(opts, name, parse_val(decl.ty, val))
+        return opts
+
+    return parse
+
+
+def timed(fn, argv):
+    """Best seconds of three calls"""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        fn(argv)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak(fn, argv):
+    """tracemalloc peak bytes of one call, excluding the argv itself"""
+    gc.collect()
+    tracemalloc.start()
+    result = fn(argv)
+    _, top = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return top
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--max-exp", type=int, default=6, help="largest count is 10**max_exp")
+    opts = ap.parse_args()
+
+    total = [0]
+
+    def count(name, value):
+        total[0] += value
+
+    variants = [
+        ("legacy", legacy(compile_spec(USAGE))),
+        ("untyped", Clyde.from_usage_lines(USAGE)),
+        ("typed", Clyde.from_usage_lines(USAGE, typed=True)),
+        ("on_repeat", Clyde.from_usage_lines(USAGE, typed=True, on_repeat=count)),
+    ]
+    print(f"{'count':>9} " + " ".join(f"{name + ' ms':>14} {'peak':>10}" for name, _ in variants))
+    for exp in range(3, opts.max_exp + 1):
+        argv = [f"--id={n}" for n in range(10 ** exp)]
+        cells = []
+        for _, fn in variants:
+            cells.append(f"{timed(fn, argv) * 1000:>14.2f} {peak(fn, argv) / 1024:>8.0f}KB")
+        print(f"{10 ** exp:>9} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Startup cost of a minimal demo.py-style entry point
+
+Runs the entry point under `python -X importtime` with warm bytecode,
+reports the import time it triggers (everything imported after `site`)
+and the process wall time against a bare interpreter, and fails when the
+median import time exceeds the budget, a cold-path module was loaded,
+or rendering help afterwards loaded `typing`.
+
+Usage: python bench/bench_startup.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY = '''
+import sys
+from clide import Clyde
+
+usage = [
+    "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls] [--root=PATH] <dir:PATH>",
+    "Usage: mytool init <path:PATH>",
+]
+parse = Clyde.from_usage_lines(usage)
+result = parse(["serve", "--port", "9090", "/app"])
+print(" ".join(sorted(sys.modules)), file=sys.stderr)
+'''
+
+# The entry point followed by help rendering; only its modules are checked
+HELP_ENTRY = ENTRY + '''
+Clyde.help_with_docs(usage, [("serve", "Start the server")])
+print(" ".join(sorted(sys.modules)), file=sys.stderr)
+'''
+
+# Modules that the parse path must not load
+COLD_MODULES = ("typing", "clide.help", "clide.batch", "clide.codegen",
+                "concurrent.futures", "pickle", "hashlib", "re")
+
+# Modules that no measured path may load, including help rendering
+NEVER_MODULES = ("typing",)
+
+
+def run(cmd, env):
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def import_time_us(stderr):
+    """Sum cumulative time of top-level imports that happen after site"""
+    total = 0
+    after_site = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative = cumulative.strip()
+        name = name[1:].rstrip()
+        if not cumulative.isdigit():
+            continue
+        if not after_site:
+            after_site = name == "site"
+            continue
+        if not name.startswith(" "):
+            total += int(cumulative)
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--budget-ms", type=float, default=20.0,
+                    help="maximum median import time triggered by the entry point")
+    opts = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entry = os.path.join(tmp, "entry.py")
+        with open(entry, "w") as f:
+            f.write(ENTRY)
+        help_entry = os.path.join(tmp, "help_entry.py")
+        with open(help_entry, "w") as f:
+            f.write(HELP_ENTRY)
+
+        env = dict(os.environ)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        env["PYTHONPYCACHEPREFIX"] = os.path.join(tmp, "pycache")
+        env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+
+        # Warm the bytecode cache
+        _, stderr = run([sys.executable, entry], env)
+        modules = stderr.strip().splitlines()[-1].split()
+        _, stderr = run([sys.executable, help_entry], env)
+        help_modules = stderr.strip().splitlines()[-1].split()
+
+        imports, walls, bare = [], [], []
+        for _ in range(opts.runs):
+            _, stderr = run([sys.executable, "-X", "importtime", entry], env)
+            imports.append(import_time_us(stderr) / 1000.0)
+            walls.append(run([sys.executable, entry], env)[0] * 1000.0)
+            bare.append(run([sys.executable, "-c", "pass"], env)[0] * 1000.0)
+
+    median_import = statistics.median(imports)
+    print(f"entry point imports:  {median_import:8.2f} ms (median of {opts.runs})")
+    print(f"entry point wall:     {statistics.median(walls):8.2f} ms")
+    print(f"bare interpreter:     {statistics.median(bare):8.2f} ms")
+    print(f"modules loaded:       {len(modules)}")
+
+    failed = False
+    loaded_cold = [m for m in COLD_MODULES if m in modules]
+    if loaded_cold:
+        print(f"FAIL: cold-path modules loaded: {', '.join(loaded_cold)}")
+        failed = True
+    loaded_never = [m for m in NEVER_MODULES if m in help_modules]
+    if loaded_never:
+        print(f"FAIL: loaded by help rendering: {', '.join(loaded_never)}")
+        failed = True
+    if median_import > opts.budget_ms:
+        print(f"FAIL: import time {median_import:.2f} ms exceeds budget {opts.budget_ms:.2f} ms")
+        failed = True
+    if not failed:
+        print(f"OK: within {opts.budget_ms:.2f} ms budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Clyde benchmark suite
+
+Times from_lines, choose_command, parse_with, render and render_with_docs
+on generated specs, scaling the number of commands, options, argv length
+and occurrences of a repeatable option, plus strict matching and a warm
+result cache hit. render and render_with_docs clear the help caches on
+every call; the *_cached cases time the memoized lookups. Results are
+written as JSON; pass --compare with an earlier run to flag regressions.
+
+Usage: python bench/bench_suite.py [--quick] [--out FILE] [--compare FILE] [--threshold 1.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clide import help as help_module  # noqa: E402
+from clide.help import render, render_with_docs  # noqa: E402
+from clide.parser import from_lines  # noqa: E402
+from clide.runtime import CompiledSpec, choose_command, compile_command, parse_with  # noqa: E402
+
+
+def clear_help_caches():
+    """Drop memoized help so render calls rebuild it"""
+    for fn in (help_module._usage_lines, help_module._synth_cached,
+               help_module._render_with_docs_cached, help_module._render_command_cached):
+        fn.cache_clear()
+
+
+def render_uncached(spec):
+    clear_help_caches()
+    return render(spec)
+
+
+def render_with_docs_uncached(spec, docs):
+    clear_help_caches()
+    return render_with_docs(spec, docs)
+
+
+def make_usage(commands, options):
+    """One Usage: line per command, each with `options` options"""
+    lines = []
+    for c in range(commands):
+        parts = [f"Usage: tool cmd{c}", "[-v|--verbose]"]
+        for o in range(options):
+            kind = o % 3
+            if kind == 0:
+                parts.append(f"[--int{o}=INT:{o}]")
+            elif kind == 1:
+                parts.append(f"[--flag{o}]")
+            else:
+                parts.append(f"[--path{o}=PATH]")
+        parts.append("[--rep=STR+]")
+        parts.append("<dir:PATH>")
+        lines.append(" ".join(parts))
+    return lines
+
+
+def make_docs(spec):
+    return [(cmd.name, f"Run {cmd.name}") for cmd in spec.commands]
+
+
+def make_argv(command, options, length, repeats=0):
+    """argv for `cmd{command}` with about `length` option tokens"""
+    argv = [f"cmd{command}"]
+    o = 0
+    while len(argv) < length:
+        kind = o % 3
+        if kind == 0:
+            argv.append(f"--int{o}={o * 7}")
+        elif kind == 1:
+            argv.append(f"--flag{o}")
+        else:
+            argv.extend([f"--path{o}", f"/tmp/p{o}"])
+        o = (o + 1) % max(options, 1)
+    argv.extend(f"--rep=r{r}" for r in range(repeats))
+    argv.append("/work")
+    return argv
+
+
+def measure(fn, min_time):
+    """Best seconds-per-call over several autoranged runs"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return best, number
+
+
+def cases(quick):
+    scale_cmds = (1, 10, 50) if quick else (1, 10, 100, 400)
+    scale_opts = (5, 20) if quick else (5, 20, 60, 120)
+    scale_len = (4, 16) if quick else (4, 16, 64, 256)
+    scale_reps = (10, 100) if quick else (10, 100, 1000, 10000)
+
+    for n in scale_cmds:
+        usage = make_usage(n, 10)
+        spec = from_lines(usage)
+        docs = make_docs(spec)
+        argv = make_argv(n - 1, 10, 8)
+        yield "from_lines", {"commands": n, "options": 10}, lambda u=usage: from_lines(u)
+        yield "choose_command", {"commands": n}, lambda s=spec, a=argv: choose_command(s, a)
+        yield "render", {"commands": n, "options": 10}, lambda s=spec: render_uncached(s)
+        yield ("render_with_docs", {"commands": n, "options": 10},
+               lambda s=spec, d=docs: render_with_docs_uncached(s, d))
+        yield "render_cached", {"commands": n, "options": 10}, lambda s=spec: render(s)
+        yield ("render_with_docs_cached", {"commands": n, "options": 10},
+               lambda s=spec, d=docs: render_with_docs(s, d))
+
+    for n in scale_opts:
+        spec = from_lines(make_usage(1, n))
+        cmd = compile_command(spec.commands[0])
+        argv = make_argv(0, n, 16)
+        yield "parse_with", {"options": n, "argv": len(argv)}, lambda c=cmd, a=argv: parse_with(c, a)
+
+    spec = from_lines(make_usage(1, 30))
+    cmd = compile_command(spec.commands[0])
+    for n in scale_len:
+        argv = make_argv(0, 30, n)
+        yield "parse_with", {"options": 30, "argv": len(argv)}, lambda c=cmd, a=argv: parse_with(c, a)
+
+    strict = CompiledSpec(spec, strict=True)
+    for n in scale_len:
+        argv = make_argv(0, 30, n)
+        yield "parse_strict", {"options": 30, "argv": len(argv)}, lambda p=strict, a=argv: p(a)
+
+    cached = CompiledSpec(spec, cache_size=128)
+    for n in scale_len:
+        argv = make_argv(0, 30, n)
+        yield "parse_cached", {"options": 30, "argv": len(argv)}, lambda p=cached, a=argv: p(a)
+
+    for r in scale_reps:
+        argv = make_argv(0, 30, 2, repeats=r)
+        yield "parse_with", {"options": 30, "repeats": r}, lambda c=cmd, a=argv: parse_with(c, a)
+
+
+def case_key(entry):
+    params = ",".join(f"{k}={v}" for k, v in sorted(entry["params"].items()))
+    return f"{entry['name']}[{params}]"
+
+
+def compare(results, baseline_path, threshold):
+    """Print ratios against a baseline run; return the regressed case keys"""
+    with open(baseline_path) as f:
+        baseline = {case_key(e): e for e in json.load(f)["results"]}
+    regressions = []
+    print(f"\n{'case':<52} {'ratio':>8}")
+    for entry in results:
+        key = case_key(entry)
+        if key not in baseline:
+            continue
+        ratio = entry["seconds_per_call"] / baseline[key]["seconds_per_call"]
+        mark = "  REGRESSION" if ratio > threshold else ""
+        print(f"{key:<52} {ratio:>8.2f}{mark}")
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--quick", action="store_true", help="smaller scales, shorter runs")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=1.25,
+                    help="slowdown ratio reported as a regression")
+    opts = ap.parse_args()
+
+    min_time = 0.05 if opts.quick else 0.2
+    results = []
+    for name, params, fn in cases(opts.quick):
+        seconds, number = measure(fn, min_time)
+        entry = {"name": name, "params": params, "seconds_per_call": seconds,
+                 "calls_per_sec": 1.0 / seconds, "number": number}
+        results.append(entry)
+        print(f"{case_key(entry):<52} {seconds * 1e6:>12.2f} us")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "quick": opts.quick,
+        },
+        "results": results,
+    }
+    with open(opts.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {opts.out}")
+
+    if opts.compare:
+        regressions = compare(results, opts.compare, opts.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {opts.threshold:.2f}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,170 @@
 """Clyde: Augmented POSIX Usage -> argv parser for Python
 
 Clyde turns annotated `Usage:` lines into fully validated command-line parsers.
+
+Importing the package loads nothing but this module. The parsing hot path
+(spec, parser, runtime, cache) loads on first use, and cold paths such as
+help rendering and batch parsing load only when they are called.
 """
 
-from typing import List, Tuple, Callable
-from .spec import Spec
-from .parser import ParseError, from_lines
-from .runtime import ArgError, ParseResult, choose_command, parse_with
-from .help import render, render_with_docs
+from __future__ import annotations
+
+from time import perf_counter
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+    from .runtime import ArgError, CompiledSpec, ParseResult
+
+# Public name -> defining submodule, resolved on first attribute access
+_LAZY = {
+    'Spec': 'spec',
+    'Type': 'spec',
+    'ParseError': 'parser',
+    'from_lines': 'parser',
+    'compile_spec': 'cache',
+    'ArgError': 'runtime',
+    'ParseResult': 'runtime',
+    'FrozenParseResult': 'runtime',
+    'CompiledCommand': 'runtime',
+    'CompiledSpec': 'runtime',
+    'choose_command': 'runtime',
+    'compile_command': 'runtime',
+    'parse_with': 'runtime',
+    'IncrementalParser': 'incremental',
+    'Registry': 'registry',
+    'LazySpec': 'lazy',
+    'render': 'help',
+    'render_with_docs': 'help',
+    'render_command': 'help',
+}
+
+_SUBMODULES = ('spec', 'parser', 'cache', 'runtime', 'help', 'batch', 'codegen', 'profiling',
+               'complete', 'incremental', 'argfiles', 'shell', 'automaton',
+               'registry', 'lazy', 'launcher', 'suggest')
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        module = __import__(f'{__name__}.{_LAZY[name]}', fromlist=[name])
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = __import__(f'{__name__}.{name}', fromlist=[name])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | set(_SUBMODULES))
 
 
 class Clyde:
     """Main Clyde API"""
 
     @staticmethod
-    def from_usage_lines(usage: List[str]) -> Callable[[List[str]], ParseResult]:
-        """Parse usage lines and return a parser function"""
-        spec = from_lines(usage)
+    def from_usage_lines(usage: List[str], typed: bool = False, stream: bool = False,
+                         max_repeats: Optional[int] = None,
+                         on_repeat: Optional[Callable[[str, object], None]] = None,
+                         argfiles: bool = False, cache_size: int = 0,
+                         strict: bool = False) -> CompiledSpec:
+        """Parse usage lines and return a compiled, callable parser
+
+        With `typed=True` results carry int, bool, pathlib.Path and str
+        values instead of validated strings. With `stream=True` a variadic
+        positional (`<files:PATH>...`) is returned as a generator that
+        validates values as they are consumed. `max_repeats` caps how often
+        a repeatable option may occur, and `on_repeat(name, value)` receives
+        repeatable option values instead of the result. With
+        `argfiles=True`, `@file` and `--args-from=-` arguments are expanded
+        before a command is chosen. `cache_size=N` memoizes the results of
+        the last N distinct argvs as immutable FrozenParseResult objects
+        (see `parser.cache_info()`). With `strict=True` argv must follow the
+        usage structure: literals in order, at most one member of each
+        `[a|b]` group, options outside brackets given (see
+        clide.automaton). `parser.profiler` records phase timings
+        once enabled (or when CLIDE_PROFILE=1 is set).
+        """
+        from .cache import compile_spec
+        from .runtime import CompiledSpec
+
+        start = perf_counter()
+        spec = compile_spec(usage)
+        elapsed = perf_counter() - start
+        parser = CompiledSpec(spec, typed=typed, stream=stream, max_repeats=max_repeats,
+                              on_repeat=on_repeat, argfiles=argfiles, cache_size=cache_size,
+                              strict=strict)
+        parser.profiler.seconds["compile"] += elapsed
+        return parser
+
+    @staticmethod
+    def parse_many(usage: List[str], argvs: Iterable[Sequence[str]], workers: int = 0,
+                   chunksize: int = 1024, typed: bool = False
+                   ) -> List[Union[ParseResult, ArgError]]:
+        """Parse many argvs against one spec; failures come back as ArgError values"""
+        from . import batch
 
-        def parse(argv: List[str]) -> ParseResult:
-            cmd = choose_command(spec, argv)
-            return parse_with(cmd, argv)
+        parser = Clyde.from_usage_lines(usage, typed=typed)
+        return batch.parse_many(parser, argvs, workers=workers, chunksize=chunksize)
 
-        return parse
+    @staticmethod
+    def iter_parse(usage: List[str], argvs: Iterable[Sequence[str]], workers: int = 0,
+                   chunksize: int = 1024, typed: bool = False
+                   ) -> Iterator[Union[ParseResult, ArgError]]:
+        """Streaming variant of parse_many, yielding results in input order"""
+        from . import batch
+
+        parser = Clyde.from_usage_lines(usage, typed=typed)
+        return batch.iter_parse(parser, argvs, workers=workers, chunksize=chunksize)
+
+    @staticmethod
+    def parse_string(usage: List[str], line: str, typed: bool = False) -> ParseResult:
+        """Parse a shell-quoted command line, split as shlex.split would"""
+        return Clyde.from_usage_lines(usage, typed=typed).parse_string(line)
+
+    @staticmethod
+    def parse_strings(usage: List[str], lines: Iterable[str], workers: int = 0,
+                      chunksize: int = 1024, typed: bool = False
+                      ) -> List[Union[ParseResult, ArgError]]:
+        """parse_many for shell-quoted lines; quoting errors come back as ArgError values"""
+        from . import batch
+
+        parser = Clyde.from_usage_lines(usage, typed=typed)
+        return batch.parse_many(parser, lines, workers=workers, chunksize=chunksize,
+                                strings=True)
 
     @staticmethod
     def help_of(usage: List[str]) -> str:
         """Render help text from usage lines"""
-        spec = from_lines(usage)
-        return render(spec)
+        from .cache import compile_spec
+        from .help import render
+
+        return render(compile_spec(usage))
 
     @staticmethod
     def help_with_docs(usage: List[str], docs: List[Tuple[str, str]]) -> str:
         """Render help text with user-provided documentation"""
-        spec = from_lines(usage)
+        from .cache import compile_spec
+        from .help import render_with_docs
+
+        return render_with_docs(compile_spec(usage), docs)
+
+    @staticmethod
+    def help_for(usage: List[str], argv: Sequence[str],
+                 docs: Sequence[Tuple[str, str]] = ()) -> str:
+        """Render help for the command argv selects, e.g. `tool serve --help`
+
+        Falls back to the full help when argv names no command.
+        """
+        from .cache import compile_spec
+        from .help import render_command, render_with_docs
+
+        spec = compile_spec(usage)
+        if argv and argv[0] in spec.index:
+            return render_command(spec, spec.index[argv[0]].name, docs)
         return render_with_docs(spec, docs)
 
 
-__all__ = ['Clyde', 'ParseError', 'ArgError', 'ParseResult', 'Type']
+__all__ = ['Clyde', 'ParseError', 'ArgError', 'ParseResult', 'CompiledCommand',
+           'CompiledSpec', 'Type']
@@ -0,0 +1,283 @@
+"""Clyde argument files
+
+`expand_argv` replaces `@path` response files and `--args-from=PATH` (or
+`--args-from=-` for stdin) with the arguments they contain, before a
+command is chosen, so the parse is the same as with the arguments inline.
+Expansion stops at `--` and is not recursive.
+
+Files are never split into a list: `MappedArgs` is a read-only sequence
+that decodes one block of arguments at a time as the parser reaches it,
+keeping a small block index for random access, and `ChainedArgs` joins
+the inline and file segments. Files of 1 MiB or more are memory-mapped,
+smaller ones are read into memory. `CompiledSpec` closes the mappings
+after a parse unless the result's leftovers still view them; those are
+released with the result.
+
+A response file holds NUL-terminated arguments if it contains a NUL byte
+and one argument per line otherwise; `--args-from` input is always
+NUL-terminated, as written by `find -print0`. A blank line is an empty
+argument, as `\0\0` is, since a line-per-argument file has no other way
+to pass one.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import stat
+import sys
+from array import array
+from bisect import bisect_right
+
+from .runtime import ArgError, ArgvView
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import BinaryIO, Iterator, List, Optional, Sequence, Union
+
+ARGS_FROM = "--args-from"
+
+# Bytes decoded at a time
+_BLOCK = 1 << 16
+
+# Bytes per slice when counting separators in a mapping
+_COUNT_CHUNK = 1 << 24
+
+# Files at least this large are memory-mapped instead of read
+_MAP_MIN = 1 << 20
+
+
+class MappedArgs:
+    """Arguments separated by `sep` in a bytes-like buffer, decoded on access
+
+    The buffer is decoded one block of about 64 KiB at a time, so memory
+    stays at one block of strings plus 16 bytes of index per block.
+    """
+    __slots__ = ("name", "_buf", "_sep", "_len", "_firsts", "_offsets", "_first", "_block")
+
+    def __init__(self, buf: Union[bytes, mmap.mmap], sep: bytes, name: str = "<args>"):
+        self.name = name
+        self._buf = buf
+        self._sep = sep
+        size = len(buf)
+        count = 0
+        for start in range(0, size, _COUNT_CHUNK):
+            count += buf[start:start + _COUNT_CHUNK].count(sep)
+        # Every argument is terminated by sep, except that the last may not be
+        if size and buf[size - 1:size] != sep:
+            count += 1
+        self._len = count
+        # First argument index and byte offset of each block found so far
+        self._firsts = array('Q', [0])
+        self._offsets = array('Q', [0])
+        self._first = 0
+        self._block: List[str] = []
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _load(self, n: int) -> List[str]:
+        """Decode block `n`, recording where block n + 1 starts"""
+        buf, sep = self._buf, self._sep
+        size = len(buf)
+        start = self._offsets[n]
+        end = start + _BLOCK
+        if end >= size:
+            end = next_start = size
+            if buf[size - 1:size] == sep:
+                end -= 1
+        else:
+            cut = buf.rfind(sep, start, end)
+            if cut < 0:
+                # One argument longer than a block
+                cut = buf.find(sep, end)
+                if cut < 0:
+                    cut = size
+            end = cut
+            next_start = cut + 1
+        text = buf[start:end].decode("utf-8", "surrogateescape")
+        block = text.split(sep.decode())
+        if sep == b"\n" and "\r" in text:
+            block = [arg[:-1] if arg.endswith("\r") else arg for arg in block]
+        if n + 1 == len(self._offsets) and next_start < size:
+            self._firsts.append(self._firsts[n] + len(block))
+            self._offsets.append(next_start)
+        self._first = self._firsts[n]
+        self._block = block
+        return block
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[k] for k in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("MappedArgs index out of range")
+        k = index - self._first
+        if 0 <= k < len(self._block):
+            return self._block[k]
+        n = bisect_right(self._firsts, index) - 1
+        block = self._load(n)
+        while index >= self._first + len(block):
+            n += 1
+            block = self._load(n)
+        return block[index - self._first]
+
+    def __iter__(self) -> Iterator[str]:
+        if not self._len:
+            return
+        n = 0
+        while True:
+            block = self._load(n)
+            yield from block
+            if n + 1 == len(self._offsets):
+                return
+            n += 1
+
+    def close(self):
+        """Release the mapping; the sequence must not be used afterwards"""
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    def __enter__(self) -> "MappedArgs":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"MappedArgs(name={self.name}, len={self._len})"
+
+
+class ChainedArgs:
+    """Several argument sequences read as one"""
+    __slots__ = ("_parts", "_starts", "_len", "_part")
+
+    def __init__(self, parts: Sequence[Sequence[str]]):
+        self._parts = [p for p in parts if len(p)]
+        self._starts: List[int] = []
+        total = 0
+        for part in self._parts:
+            self._starts.append(total)
+            total += len(part)
+        self._len = total
+        self._part = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[k] for k in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("ChainedArgs index out of range")
+        n = self._part
+        start = self._starts[n]
+        if not start <= index < start + len(self._parts[n]):
+            n = self._part = bisect_right(self._starts, index) - 1
+            start = self._starts[n]
+        return self._parts[n][index - start]
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._parts:
+            yield from part
+
+    def close(self):
+        """Release the mappings of the file segments"""
+        for part in self._parts:
+            if isinstance(part, MappedArgs):
+                part.close()
+
+    def __repr__(self):
+        return f"ChainedArgs(parts={len(self._parts)}, len={self._len})"
+
+
+def _map_file(f: BinaryIO, name: str) -> Union[bytes, mmap.mmap]:
+    """The rest of f from its current position, mapped when large enough
+
+    A mapping always starts at offset 0, so a file that has been read or
+    seeked into is read from its position instead.
+    """
+    if f.tell() or os.fstat(f.fileno()).st_size < _MAP_MIN:
+        return f.read()
+    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Leave f at the end, as reading it would
+    f.seek(0, os.SEEK_END)
+    return buf
+
+
+def read_args_file(path: str, sep: Optional[bytes] = None) -> MappedArgs:
+    """Map an argument file; `sep=None` picks NUL if the file has one, else newline
+
+    Call close() (or use it as a context manager) to release a mapping
+    early; otherwise it is released when the sequence is collected.
+    """
+    try:
+        with open(path, "rb") as f:
+            buf = _map_file(f, path)
+    except OSError as e:
+        raise ArgError(f"Cannot read arguments from {path}: {e.strerror}")
+    if sep is None:
+        sep = b"\0" if buf.find(b"\0") >= 0 else b"\n"
+    return MappedArgs(buf, sep, path)
+
+
+def read_args_stream(stream: Optional[BinaryIO] = None) -> MappedArgs:
+    """NUL-terminated arguments from a binary stream (default: stdin)
+
+    Arguments are taken from the stream's current position. A regular file
+    behind the stream is memory-mapped when read from its start; a pipe is
+    read into one buffer.
+    """
+    if stream is None:
+        stream = sys.stdin.buffer
+    try:
+        fileno = stream.fileno()
+        regular = stat.S_ISREG(os.fstat(fileno).st_mode)
+    except (AttributeError, OSError, ValueError):
+        regular = False
+    if regular:
+        buf = _map_file(stream, "-")
+    else:
+        buf = stream.read()
+    return MappedArgs(buf, b"\0", "-")
+
+
+def expand_argv(argv: Sequence[str], args_from: str = ARGS_FROM) -> Sequence[str]:
+    """argv with response files and --args-from sources spliced in
+
+    Returns argv itself when there is nothing to expand, and otherwise a
+    ChainedArgs whose close() releases the file mappings.
+    """
+    parts: List[Sequence[str]] = []
+    start = 0
+    i = 0
+    n = len(argv)
+    while i < n:
+        arg = argv[i]
+        if arg == "--":
+            break
+        end = i + 1
+        if arg.startswith("@") and len(arg) > 1:
+            source = read_args_file(arg[1:])
+        elif arg.startswith(args_from + "="):
+            value = arg[len(args_from) + 1:]
+            source = read_args_stream() if value == "-" else read_args_file(value, b"\0")
+        elif arg == args_from:
+            if i + 1 >= n:
+                raise ArgError(f"Missing value for {args_from}")
+            value = argv[i + 1]
+            source = read_args_stream() if value == "-" else read_args_file(value, b"\0")
+            end = i + 2
+        else:
+            i += 1
+            continue
+        parts.append(ArgvView(argv, start, i))
+        parts.append(source)
+        start = i = end
+    if not parts:
+        return argv
+    parts.append(ArgvView(argv, start))
+    return ChainedArgs(parts)
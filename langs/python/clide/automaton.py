@@ -0,0 +1,273 @@
+"""Clyde strict matcher
+
+The default token loop accepts a required literal anywhere in argv, never
+checks that it was given, and lets every member of a `[a|b]` group appear
+together. `Automaton` compiles a command's usage line into a deterministic
+automaton that enforces that structure instead:
+
+- Plain tokens walk the non-option items in usage order. Each state maps
+  every literal it can accept, directly or by skipping optional items, to
+  the next state, and falls back to at most one positional slot, so each
+  token costs one dict lookup whatever the size of the spec.
+- Options may appear anywhere before `--`, as before, but members of one
+  `[a|b]` group exclude each other, and an option written outside
+  brackets must be given unless it has a default.
+- A `[-s|--long]` pair of one short and one long name of the same kind is
+  two spellings of one option, not alternatives, so both may be given.
+
+Results have the same shape as the default parser's, and positional
+defaults and variadic positionals follow the same rules.
+"""
+
+from __future__ import annotations
+
+from .runtime import ArgError, ArgvView, _MISSING, _NO_LEFTOVERS, _add_repeat, _take_variadic
+from .spec import Lit, OptBool, OptVal, Pos
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Sequence, Tuple
+    from .runtime import CompiledCommand
+    from .spec import Atom, Group
+
+    # (next state, exclusive group or -1, member label)
+    Edge = Tuple[int, int, str]
+
+
+def _label(atom: Atom) -> str:
+    if isinstance(atom, Lit):
+        return atom.value
+    if isinstance(atom, Pos):
+        return f"<{atom.name}>"
+    return atom.long or atom.short
+
+
+def _is_alias_pair(group: Group) -> bool:
+    """Whether an alternation is `-s|--long` spelling of one option"""
+    if len(group.atoms) != 2:
+        return False
+    a, b = group.atoms
+    if type(a) is not type(b) or not isinstance(a, (OptBool, OptVal)):
+        return False
+    if isinstance(a, OptVal) and a.ty != b.ty:
+        return False
+    return {a.long is None, b.long is None} == {True, False}
+
+
+class _Step:
+    """One non-option item of the usage line"""
+    __slots__ = ("lits", "slot", "pos_label", "variadic", "required", "group")
+
+    def __init__(self, required: bool, group: int):
+        self.lits: List[str] = []
+        self.slot: Optional[int] = None
+        self.pos_label = ""
+        self.variadic = False
+        self.required = required
+        self.group = group
+
+
+class Automaton:
+    """A command's usage structure compiled for strict matching
+
+    `literals[k]` maps each literal accepted in state k to its edge,
+    `positional[k]` is the (slot, edge) a non-literal token takes, and
+    `missing[k]` names the required literal still owed when argv ends in
+    state k.
+    """
+    __slots__ = ("cmd", "literals", "positional", "expected", "missing", "exclusive",
+                 "required_options")
+
+    def __init__(self, cmd: CompiledCommand):
+        self.cmd = cmd
+        # Option name -> (exclusive group, member label)
+        self.exclusive: Dict[str, Tuple[int, str]] = {}
+        # (label, names) of options written outside brackets without a default
+        self.required_options: List[Tuple[str, Tuple[str, ...]]] = []
+        steps: List[_Step] = []
+
+        slot = 0
+        for index, item in enumerate(cmd.command.items):
+            group = item.group
+            exclusive = group.is_alt and not _is_alias_pair(group)
+            step = None
+            for atom in group.atoms:
+                if isinstance(atom, (OptBool, OptVal)):
+                    names = tuple(n for n in (atom.long, atom.short) if n)
+                    if exclusive:
+                        for name in names:
+                            self.exclusive.setdefault(name, (index, _label(atom)))
+                    if item.required and (isinstance(atom, OptBool) or atom.default is None):
+                        self.required_options.append((_label(atom), names))
+                    continue
+                if step is None:
+                    step = _Step(item.required, index if exclusive else -1)
+                    steps.append(step)
+                if isinstance(atom, Lit):
+                    step.lits.append(atom.value)
+                else:
+                    if step.slot is None:
+                        step.slot = slot
+                        step.pos_label = _label(atom)
+                        step.variadic = atom.variadic
+                    slot += 1
+
+        n = len(steps)
+        self.literals: List[Dict[str, Edge]] = []
+        self.positional: List[Optional[Tuple[int, Edge]]] = []
+        self.expected: List[str] = []
+        self.missing: List[Optional[str]] = []
+        variadic: Optional[Tuple[int, str]] = None
+        for k in range(n + 1):
+            lits: Dict[str, Edge] = {}
+            pos = None
+            missing = None
+            for j in range(k, n):
+                step = steps[j]
+                for lit in step.lits:
+                    lits.setdefault(lit, (j + 1, step.group, lit))
+                if step.slot is not None and pos is None:
+                    pos = (step.slot, (j + 1, step.group, step.pos_label))
+                if step.required:
+                    if step.slot is None:
+                        missing = "|".join(step.lits)
+                    break
+            if pos is None and variadic is not None:
+                # Later plain tokens keep filling the variadic positional
+                pos = (variadic[0], (k, -1, variadic[1]))
+            if k < n and steps[k].variadic:
+                variadic = (steps[k].slot, steps[k].pos_label)
+            choices = list(lits)
+            if pos is not None:
+                choices.append(pos[1][2])
+            self.literals.append(lits)
+            self.positional.append(pos)
+            self.expected.append("|".join(choices))
+            self.missing.append(missing)
+
+    def _use(self, used: Dict[int, str], group: int, label: str):
+        other = used.get(group)
+        if other is None:
+            used[group] = label
+        elif other != label:
+            raise ArgError(f"{label} cannot be used with {other}")
+
+    def scan(self, argv: Sequence[str]
+             ) -> Tuple[Dict[str, List[object]], Dict[str, object], ArgvView]:
+        """The strict counterpart of the default token loop"""
+        cmd = self.cmd
+        options = cmd.options
+        pos_list = cmd.positionals
+        convert = cmd.convert
+        special = cmd.special
+        exclusive = self.exclusive
+        literals = self.literals
+        positional = self.positional
+
+        opts_map: Dict[str, List[object]] = {}
+        pos_map: Dict[str, object] = {}
+        used: Dict[int, str] = {}
+        state = 0
+        leftovers = _NO_LEFTOVERS
+
+        it = iter(argv)
+        i = -1
+        for arg in it:
+            i += 1
+            if arg == "--":
+                state, leftovers = self._after_dashes(argv, i + 1, it, state, pos_map, used)
+                break
+            elif arg.startswith('-'):
+                if '=' in arg:
+                    pos = arg.find('=')
+                    name = arg[:pos]
+                    val_part = arg[pos + 1:]
+                else:
+                    name = arg
+                    val_part = None
+
+                decl = options.get(name)
+                if decl is None:
+                    raise cmd.unknown_option(name)
+                member = exclusive.get(name)
+                if member is not None:
+                    self._use(used, member[0], member[1])
+
+                if isinstance(decl, OptBool):
+                    val = cmd.true_val
+                elif val_part is not None:
+                    val = convert(decl.ty, val_part)
+                else:
+                    val = next(it, _MISSING)
+                    if val is _MISSING:
+                        raise ArgError(f"Missing value for {name}")
+                    i += 1
+                    val = convert(decl.ty, val)
+                if name in special:
+                    _add_repeat(cmd, opts_map, name, val)
+                else:
+                    vals = opts_map.get(name)
+                    if vals is None:
+                        opts_map[name] = [val]
+                    else:
+                        vals.append(val)
+            else:
+                edge = literals[state].get(arg)
+                if edge is None:
+                    target = positional[state]
+                    if target is None:
+                        expected = self.expected[state]
+                        if expected:
+                            raise ArgError(f"Unexpected argument: {arg} (expected {expected})")
+                        raise ArgError(f"Unexpected argument: {arg}")
+                    slot, edge = target
+                    name, ty, _ = pos_list[slot]
+                    if slot == cmd.variadic:
+                        vals = pos_map.get(name)
+                        if vals is None:
+                            pos_map[name] = [convert(ty, arg)]
+                        else:
+                            vals.append(convert(ty, arg))
+                    else:
+                        pos_map[name] = convert(ty, arg)
+                if edge[1] >= 0:
+                    self._use(used, edge[1], edge[2])
+                state = edge[0]
+
+        missing = self.missing[state]
+        if missing is not None:
+            raise ArgError(f"Missing argument: {missing}")
+        for label, names in self.required_options:
+            if not any(name in opts_map for name in names):
+                raise ArgError(f"Missing option: {label}")
+        return opts_map, pos_map, leftovers
+
+    def _after_dashes(self, argv: Sequence[str], rest: int, it, state: int,
+                      pos_map: Dict[str, object], used: Dict[int, str]
+                      ) -> Tuple[int, ArgvView]:
+        """Fill the positionals still ahead of state from the tokens after `--`"""
+        cmd = self.cmd
+        pos_list = cmd.positionals
+        taken = 0
+        while True:
+            target = self.positional[state]
+            if target is None:
+                break
+            slot, (next_state, group, label) = target
+            name, ty, default = pos_list[slot]
+            if slot == cmd.variadic:
+                _take_variadic(cmd, pos_map, it, name, ty, default)
+                return state, _NO_LEFTOVERS
+            val = next(it, _MISSING)
+            if val is _MISSING:
+                break
+            taken += 1
+            pos_map[name] = cmd.convert(ty, val)
+            if group >= 0:
+                self._use(used, group, label)
+            state = next_state
+        # Literals cannot follow `--`, so a required one still ahead is missing
+        return state, ArgvView(argv, rest + taken)
+
+    def __repr__(self):
+        return f"Automaton(command={self.cmd.name}, states={len(self.literals)})"
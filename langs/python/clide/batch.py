@@ -0,0 +1,106 @@
+"""Clyde batch parsing
+
+Parses many argv vectors against one compiled spec. Per-item failures are
+returned in place of the result as `ArgError` values, so one bad argv does
+not abort the batch. With `strings=True` the items are shell-quoted
+command lines, split by `clide.shell` in the same pass. With `workers > 0`
+the work is fanned out in chunks to a `concurrent.futures` process pool;
+each worker compiles the spec once, with the same settings as the
+caller's parser.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .runtime import ArgError, CompiledSpec, ParseResult
+from .spec import Spec
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+    BatchItem = Union[ParseResult, ArgError]
+
+_worker_parser: Optional[CompiledSpec] = None
+
+
+def _settings(parser: CompiledSpec) -> Dict[str, object]:
+    """Constructor arguments that rebuild parser in a worker"""
+    if parser.stream or parser.on_repeat is not None:
+        # Streamed values and on_repeat effects would stay in the worker
+        raise ValueError("workers cannot be combined with stream or on_repeat")
+    return {
+        "typed": parser.typed,
+        "max_repeats": parser.max_repeats,
+        "argfiles": parser.argfiles,
+        "cache_size": parser.cache_size,
+        "strict": parser.strict,
+    }
+
+
+def _init_worker(spec: Spec, settings: Dict[str, object]):
+    global _worker_parser
+    _worker_parser = CompiledSpec(spec, **settings)
+
+
+def _parse_chunk(chunk: List[Sequence[str]], strings: bool = False) -> List[BatchItem]:
+    return list(_parse_serial(_worker_parser, chunk, strings))
+
+
+def _parse_serial(parser: CompiledSpec, argvs: Iterable[Sequence[str]],
+                  strings: bool = False) -> Iterator[BatchItem]:
+    if strings:
+        from .shell import split
+    for argv in argvs:
+        try:
+            yield parser(split(argv) if strings else argv)
+        except ArgError as e:
+            yield e
+
+
+def _chunks(argvs: Iterable[Sequence[str]], size: int) -> Iterator[List[Sequence[str]]]:
+    it = iter(argvs)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_parse(parser: CompiledSpec, argvs: Iterable[Sequence[str]],
+               workers: int = 0, chunksize: int = 1024,
+               strings: bool = False) -> Iterator[BatchItem]:
+    """Lazily parse argvs in input order, yielding a result or ArgError each
+
+    With `workers > 0`, chunks of `chunksize` argvs are parsed in a process
+    pool; at most `2 * workers` chunks are in flight, so arbitrarily long
+    inputs stream with bounded memory. Pooling is refused for parsers with
+    `stream` or `on_repeat`, whose results cannot leave the worker.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1")
+    if workers <= 0:
+        yield from _parse_serial(parser, argvs, strings)
+        return
+
+    settings = _settings(parser)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(parser.spec, settings)) as pool:
+        pending: deque = deque()
+        for chunk in _chunks(argvs, chunksize):
+            pending.append(pool.submit(_parse_chunk, chunk, strings))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def parse_many(parser: CompiledSpec, argvs: Iterable[Sequence[str]],
+               workers: int = 0, chunksize: int = 1024,
+               strings: bool = False) -> List[BatchItem]:
+    """Parse argvs into a list of results, with ArgError values for failures"""
+    return list(iter_parse(parser, argvs, workers=workers, chunksize=chunksize,
+                           strings=strings))
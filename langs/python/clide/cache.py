@@ -0,0 +1,197 @@
+"""Clyde spec compilation cache
+
+Compiled specs are memoized in-process by their usage lines, and can
+optionally be persisted to a directory so that short-lived processes load
+the compiled `Spec` instead of tokenizing the usage text again.
+
+The on-disk cache stores pickles; point it only at a directory that is
+private to the user running the CLI.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+
+from .parser import from_lines
+from .spec import Spec
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+# Bump when the pickled layout of Spec changes so stale files are ignored
+CACHE_FORMAT = "clide-spec-2"
+
+CACHE_DIR_ENV = "CLIDE_CACHE_DIR"
+
+_ABSENT = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping with hit/miss counters
+
+    Safe to share between threads: every operation holds an internal lock.
+    """
+    def __init__(self, maxsize: int = 128):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, marking it most recently used"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full"""
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> bool:
+        """Remove one entry; returns whether it was present"""
+        with self._lock:
+            return self._data.pop(key, _ABSENT) is not _ABSENT
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return hit/miss statistics and current occupancy"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "maxsize": self.maxsize,
+                "currsize": len(self._data),
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+
+def content_key(lines: Sequence[str]) -> str:
+    """Hash usage lines (and the cache format) into a stable file key"""
+    import hashlib
+    h = hashlib.sha256(CACHE_FORMAT.encode("utf-8"))
+    for line in lines:
+        h.update(b"\0")
+        h.update(line.encode("utf-8"))
+    return h.hexdigest()
+
+
+class SpecCache:
+    """Usage lines -> Spec cache with an optional on-disk layer"""
+    def __init__(self, maxsize: int = 128, directory: Optional[str] = None,
+                 compile_fn: Callable[[List[str]], Spec] = from_lines):
+        self.memory = LRUCache(maxsize)
+        self.directory = directory
+        self.compile_fn = compile_fn
+
+    def get(self, lines: Sequence[str]) -> Spec:
+        """Return the compiled Spec for usage lines, compiling on a miss"""
+        key = tuple(lines)
+        spec = self.memory.get(key)
+        if spec is not None:
+            return spec
+
+        spec = self._load(key)
+        if spec is None:
+            spec = self.compile_fn(list(key))
+            self._store(key, spec)
+        self.memory.put(key, spec)
+        return spec
+
+    def clear(self):
+        """Drop the in-process entries (files on disk are kept)"""
+        self.memory.clear()
+
+    def _path(self, lines: Sequence[str]) -> str:
+        return os.path.join(self.directory, content_key(lines) + ".pickle")
+
+    def _load(self, lines: Sequence[str]) -> Optional[Spec]:
+        if not self.directory:
+            return None
+        import pickle
+        try:
+            with open(self._path(lines), "rb") as f:
+                spec = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError,
+                ImportError, TypeError, ValueError):
+            return None
+        return spec if isinstance(spec, Spec) else None
+
+    def _store(self, lines: Sequence[str], spec: Spec):
+        if not self.directory:
+            return
+        import pickle
+        import tempfile
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._path(lines))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            # A read-only or full cache directory must never break parsing
+            pass
+
+
+_default_cache = SpecCache(directory=os.environ.get(CACHE_DIR_ENV) or None)
+
+
+def compile_spec(lines: Sequence[str]) -> Spec:
+    """Compile usage lines through the process-wide spec cache"""
+    return _default_cache.get(lines)
+
+
+def configure(maxsize: Optional[int] = None, directory: Optional[str] = None,
+              persist: Optional[bool] = None):
+    """Adjust the process-wide cache
+
+    `maxsize` resizes the in-process LRU (0 disables it), `directory` sets
+    the on-disk location, and `persist=False` turns the disk layer off.
+    """
+    global _default_cache
+    old = _default_cache
+    if maxsize is None:
+        maxsize = old.memory.maxsize
+    if directory is None:
+        directory = old.directory
+    if persist is False:
+        directory = None
+    _default_cache = SpecCache(maxsize=maxsize, directory=directory,
+                               compile_fn=old.compile_fn)
+
+
+def default_cache() -> SpecCache:
+    """Return the process-wide spec cache"""
+    return _default_cache
@@ -0,0 +1,399 @@
+"""Clyde parser code generator
+
+Emits Python source with one specialized parse function per command: the
+option table, literal set, positional slots, type checks and defaults are
+inlined as constants, so parsing runs straight-line code instead of the
+generic loop in `runtime.parse_with`. The source can be exec'd in memory
+with `load_parser` or written out as an importable module with
+`write_module`; either way it behaves exactly like `CompiledSpec`.
+Variadic positionals are always collected into lists (there is no
+streaming mode), and repeatable options are never capped or streamed.
+"""
+
+from __future__ import annotations
+
+from .runtime import CompiledCommand, ParseResult, _BadDefault, compile_command
+from .spec import OptBool, Spec, Type
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List
+
+# Option kinds used in the generated option tables
+_FLAG = 0
+_KIND = {Type.INT: 1, Type.BOOL: 2, Type.STR: 3, Type.PATH: 4}
+
+
+class _Writer:
+    """Accumulates indented source lines"""
+    def __init__(self):
+        self.lines: List[str] = []
+        self.depth = 0
+
+    def line(self, text: str = ""):
+        self.lines.append(("    " * self.depth + text) if text else "")
+
+    def indent(self):
+        self.depth += 1
+
+    def dedent(self):
+        self.depth -= 1
+
+
+def _emit_convert(w: _Writer, ty: Type, src: str, typed: bool):
+    """Emit code that validates `src` and leaves the value in `v`"""
+    if ty == Type.INT:
+        w.line("try:")
+        w.indent()
+        w.line(f"v = int({src})" if typed else f"int({src})")
+        w.dedent()
+        w.line("except ValueError:")
+        w.indent()
+        w.line(f'raise ArgError("Expected INT, got: " + {src})')
+        w.dedent()
+        if not typed:
+            w.line(f"v = {src}")
+    elif ty == Type.BOOL:
+        w.line(f"v = {src}.lower()")
+        w.line('if v == "true":')
+        w.indent()
+        w.line("v = True" if typed else "pass")
+        w.dedent()
+        w.line('elif v == "false":')
+        w.indent()
+        w.line("v = False" if typed else "pass")
+        w.dedent()
+        w.line("else:")
+        w.indent()
+        w.line(f'raise ArgError("Expected BOOL (true|false), got: " + {src})')
+        w.dedent()
+    elif ty == Type.PATH and typed:
+        w.line(f"v = Path({src})")
+    else:
+        w.line(f"v = {src}")
+
+
+def _literal(value: object) -> str:
+    """Source expression for a converted default value"""
+    if isinstance(value, (str, int, bool)):
+        return repr(value)
+    # pathlib.Path in typed mode
+    return f"Path({str(value)!r})"
+
+
+def _default_expr(w: _Writer, value: object):
+    """Emit the assignment of a default to `v`, or its deferred error"""
+    if isinstance(value, _BadDefault):
+        w.line(f"raise ArgError({value.message!r})")
+    else:
+        w.line(f"v = {_literal(value)}")
+
+
+def _emit_command(w: _Writer, fname: str, cc: CompiledCommand, typed: bool):
+    options = {name: (_FLAG if isinstance(decl, OptBool) else _KIND[decl.ty])
+               for name, decl in cc.options.items()}
+    # Last field: 0 single value, 1 optional variadic, 2 required variadic
+    pos_table = ", ".join(
+        f"({name!r}, {_KIND[ty]}, "
+        + ("None, " + repr(default.message) if isinstance(default, _BadDefault)
+           else ("None" if default is None else _literal(default)) + ", None")
+        + f", {0 if slot != cc.variadic else 1 + cc.variadic_required})"
+        for slot, (name, ty, default) in enumerate(cc.positionals))
+    kinds_used = sorted(set(options.values()) - {_FLAG})
+
+    w.line(f"_OPTS{fname} = {options!r}")
+    w.line(f"_LITS{fname} = {frozenset(cc.literals)!r}")
+    w.line(f"_POS{fname} = ({pos_table}{',' if cc.positionals else ''})")
+    w.line()
+    w.line()
+    w.line(f"def {fname}(argv):")
+    w.indent()
+    w.line(f'"""Parse argv for command {cc.name!r}"""')
+    w.line("opts = {}")
+    w.line("pos = {}")
+    w.line("seen = 0")
+    w.line("leftovers = _NO_LEFTOVERS")
+    w.line("n = len(argv)")
+    w.line("i = 0")
+    w.line("while i < n:")
+    w.indent()
+    w.line("arg = argv[i]")
+
+    # "--": fill remaining positionals from the rest, the remainder is leftovers
+    w.line('if arg == "--":')
+    w.indent()
+    w.line("rest = i + 1")
+    w.line(f"remaining = _POS{fname}[seen:]")
+    w.line("for j, (name, kind, default, err, many) in enumerate(remaining):")
+    w.indent()
+    if cc.variadic is not None:
+        # The variadic positional takes everything that is left
+        w.line("if many:")
+        w.indent()
+        w.line("vals = pos.get(name) or []")
+        w.line("vals.extend([_convert(kind, a) for a in argv[rest + j:]])")
+        w.line("if not vals:")
+        w.indent()
+        w.line("if err is not None:")
+        w.indent()
+        w.line("raise ArgError(err)")
+        w.dedent()
+        w.line("elif default is not None:")
+        w.indent()
+        w.line("vals = [default]")
+        w.dedent()
+        w.line("elif many == 2:")
+        w.indent()
+        w.line('raise ArgError("Missing positional: " + name)')
+        w.dedent()
+        w.dedent()
+        w.line("pos[name] = vals")
+        w.line("break")
+        w.dedent()
+    w.line("if rest + j < n:")
+    w.indent()
+    w.line("pos[name] = _convert(kind, argv[rest + j])")
+    w.dedent()
+    w.line("elif err is not None:")
+    w.indent()
+    w.line("raise ArgError(err)")
+    w.dedent()
+    w.line("elif default is not None:")
+    w.indent()
+    w.line("pos[name] = default")
+    w.dedent()
+    w.line("else:")
+    w.indent()
+    w.line('raise ArgError("Missing positional: " + name)')
+    w.dedent()
+    w.dedent()
+    w.line("else:")
+    w.indent()
+    w.line("leftovers = ArgvView(argv, rest + len(remaining))")
+    w.dedent()
+    w.line("break")
+    w.dedent()
+
+    # Options
+    w.line('if arg[:1] == "-":')
+    w.indent()
+    w.line('eq = arg.find("=")')
+    w.line("if eq >= 0:")
+    w.indent()
+    w.line("name = arg[:eq]")
+    w.line("val = arg[eq + 1:]")
+    w.dedent()
+    w.line("else:")
+    w.indent()
+    w.line("name = arg")
+    w.line("val = None")
+    w.dedent()
+    w.line(f"kind = _OPTS{fname}.get(name)")
+    w.line("if kind is None:")
+    w.indent()
+    w.line(f'raise ArgError("Unknown option: " + name, _suggest({fname!r}, _OPTS{fname}, name))')
+    w.dedent()
+    w.line(f"if kind == {_FLAG}:")
+    w.indent()
+    w.line(f"v = {True if typed else 'true'!r}")
+    w.dedent()
+    if kinds_used:
+        w.line("else:")
+        w.indent()
+        w.line("if val is None:")
+        w.indent()
+        w.line("if i + 1 < n:")
+        w.indent()
+        w.line("i += 1")
+        w.line("val = argv[i]")
+        w.dedent()
+        w.line("else:")
+        w.indent()
+        w.line('raise ArgError("Missing value for " + name)')
+        w.dedent()
+        w.dedent()
+        kind_types = {k: t for t, k in _KIND.items()}
+        for n, kind in enumerate(kinds_used):
+            if len(kinds_used) > 1:
+                w.line(f"{'if' if n == 0 else 'elif'} kind == {kind}:")
+                w.indent()
+            _emit_convert(w, kind_types[kind], "val", typed)
+            if len(kinds_used) > 1:
+                w.dedent()
+        w.dedent()
+    w.line("vals = opts.get(name)")
+    w.line("if vals is None:")
+    w.indent()
+    if cc.compact:
+        w.line(f"opts[name] = compact_values([v]) if name in {frozenset(cc.compact)!r} else [v]")
+    else:
+        w.line("opts[name] = [v]")
+    w.dedent()
+    w.line("else:")
+    w.indent()
+    if cc.compact:
+        # array('q') rejects values beyond 64 bits; fall back to a list
+        w.line("try:")
+        w.indent()
+        w.line("vals.append(v)")
+        w.dedent()
+        w.line("except OverflowError:")
+        w.indent()
+        w.line("opts[name] = list(vals) + [v]")
+        w.dedent()
+    else:
+        w.line("vals.append(v)")
+    w.dedent()
+    w.line("i += 1")
+    w.line("continue")
+    w.dedent()
+
+    # Required literals, then positional slots in order
+    if cc.literals:
+        w.line(f"if arg in _LITS{fname}:")
+        w.indent()
+        w.line("i += 1")
+        w.line("continue")
+        w.dedent()
+    for idx, (name, ty, _) in enumerate(cc.positionals):
+        w.line(f"{'if' if idx == 0 else 'elif'} seen == {idx}:")
+        w.indent()
+        _emit_convert(w, ty, "arg", typed)
+        if idx == cc.variadic:
+            w.line(f"pos.setdefault({name!r}, []).append(v)")
+            w.line("i += 1")
+            w.line("continue")
+        else:
+            w.line(f"pos[{name!r}] = v")
+        w.dedent()
+    if cc.positionals:
+        w.line("else:")
+        w.indent()
+    w.line('raise ArgError("Unexpected argument: " + arg)')
+    if cc.positionals:
+        w.dedent()
+    w.line("seen += 1")
+    w.line("i += 1")
+    w.dedent()
+
+    # Defaults
+    for key, default in cc.defaults:
+        if default is None:
+            continue
+        w.line(f"if {key!r} not in opts:")
+        w.indent()
+        _default_expr(w, default)
+        w.line(f"opts[{key!r}] = [v]")
+        w.dedent()
+    for slot, (name, ty, default) in enumerate(cc.positionals):
+        w.line(f"if {name!r} not in pos:")
+        w.indent()
+        if slot == cc.variadic and default is None and not cc.variadic_required:
+            w.line(f"pos[{name!r}] = []")
+        elif slot == cc.variadic and default is not None:
+            _default_expr(w, default)
+            w.line(f"pos[{name!r}] = [v]")
+        elif default is None:
+            w.line(f"raise ArgError({'Missing positional: ' + name!r})")
+        else:
+            _default_expr(w, default)
+            w.line(f"pos[{name!r}] = v")
+        w.dedent()
+    w.line(f"return ParseResult({cc.name!r}, opts, pos, leftovers)")
+    w.dedent()
+    w.line()
+    w.line()
+
+
+def generate_source(spec: Spec, typed: bool = False) -> str:
+    """Generate module source with a specialized parser for each command
+
+    The module defines `parse(argv)`, which dispatches like
+    `choose_command` and adds command suggestions to its errors, and one
+    `_parse_<n>` function per command.
+    """
+    compiled = [compile_command(cmd, typed=typed) for cmd in spec.commands]
+    w = _Writer()
+    w.line(f'"""Generated by clide.codegen for {spec.prog!r}; do not edit"""')
+    w.line()
+    w.line("from clide.runtime import ArgError, ArgvView, ParseResult, _NO_LEFTOVERS, "
+           "compact_values, " +
+           ("convert_val as _conv" if typed else "parse_val as _conv"))
+    w.line("from clide.spec import Type")
+    if typed:
+        w.line("from pathlib import Path")
+    w.line()
+    w.line(f"_TYPES = {{{', '.join(f'{k}: Type.{t.name}' for t, k in _KIND.items())}}}")
+    w.line(f"TYPED = {typed!r}")
+    w.line()
+    w.line()
+    w.line("def _convert(kind, s):")
+    w.indent()
+    w.line("return _conv(_TYPES[kind], s)")
+    w.dedent()
+    w.line()
+    w.line()
+    # Suggestion indexes, built on the first miss as CompiledSpec does
+    w.line("_INDEXES = {}")
+    w.line()
+    w.line()
+    w.line("def _suggest(key, names, word):")
+    w.indent()
+    w.line("index = _INDEXES.get(key)")
+    w.line("if index is None:")
+    w.indent()
+    w.line("from clide.suggest import SuggestionIndex")
+    w.line("index = _INDEXES[key] = SuggestionIndex(names)")
+    w.dedent()
+    w.line("return index.suggest(word)")
+    w.dedent()
+    w.line()
+    w.line()
+
+    names: Dict[int, str] = {}
+    for n, cc in enumerate(compiled):
+        names[id(cc.command)] = f"_parse_{n}"
+        _emit_command(w, f"_parse_{n}", cc, typed)
+
+    dispatch = ", ".join(f"{lit!r}: {names[id(cmd)]}" for lit, cmd in spec.index.items())
+    w.line(f"_DISPATCH = {{{dispatch}}}")
+    w.line(f"_DEFAULT = {names[id(spec.default)]}")
+    w.line(f"PARSERS = ({', '.join(names.values())},)")
+    w.line()
+    w.line()
+    w.line("def parse(argv):")
+    w.indent()
+    w.line('"""Choose a command for argv and parse it"""')
+    w.line("if not argv:")
+    w.indent()
+    w.line("return _DEFAULT(argv)")
+    w.dedent()
+    w.line("try:")
+    w.indent()
+    w.line("return _DISPATCH.get(argv[0], _DEFAULT)(argv)")
+    w.dedent()
+    w.line("except ArgError as e:")
+    w.indent()
+    w.line("word = argv[0]")
+    w.line('if not e.suggestions and not word.startswith("-") and word not in _DISPATCH:')
+    w.indent()
+    w.line("e.suggestions = _suggest(None, _DISPATCH, word)")
+    w.dedent()
+    w.line("raise")
+    w.dedent()
+    w.dedent()
+    return "\n".join(w.lines) + "\n"
+
+
+def load_parser(spec: Spec, typed: bool = False) -> Callable[[List[str]], ParseResult]:
+    """Generate, compile and exec the parser in memory, returning `parse`"""
+    source = generate_source(spec, typed=typed)
+    namespace: Dict[str, object] = {"__name__": f"clide_generated_{spec.prog}"}
+    exec(compile(source, f"<clide-generated {spec.prog}>", "exec"), namespace)
+    return namespace["parse"]
+
+
+def write_module(spec: Spec, path: str, typed: bool = False):
+    """Write the generated parser to `path` as an importable module"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(generate_source(spec, typed=typed))
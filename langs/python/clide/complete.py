@@ -0,0 +1,378 @@
+"""Clyde shell completion
+
+`complete` returns candidates for the word under the cursor of a partial
+argv: subcommands, option names, BOOL choices and PATH entries, plus a
+type hint for values it cannot enumerate (such as INT).
+
+`CompletionServer` keeps compiled specs warm in a long-lived process and
+answers queries over a Unix domain socket, so a TAB press costs a socket
+round trip instead of an interpreter start. `shim` prints bash or zsh
+functions that talk to it with `socat`.
+
+Wire protocol: the client sends NUL-terminated fields `prog`, `cwd`,
+`cword`, then the words after the program name, and half-closes the
+connection; the server replies with one candidate per line.
+
+The socket is created mode 0600 and, where the platform reports peer
+credentials (SO_PEERCRED), connections from other users are dropped
+unanswered. An existing file at the socket path is only replaced if it
+is a socket.
+
+    python -m clide.complete daemon --socket PATH USAGE_FILE...
+    python -m clide.complete shim bash|zsh PROG --socket PATH
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from functools import lru_cache
+
+from .cache import compile_spec
+from .runtime import CompiledCommand, compile_command
+from .spec import OptVal, Spec, Type
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Sequence
+
+
+class Completion:
+    """Candidates for the current word and a hint for untyped values"""
+    __slots__ = ("candidates", "hint")
+
+    def __init__(self, candidates: List[str], hint: Optional[str] = None):
+        self.candidates = candidates
+        self.hint = hint
+
+    def __eq__(self, other):
+        return (isinstance(other, Completion) and
+                self.candidates == other.candidates and self.hint == other.hint)
+
+    def __repr__(self):
+        return f"Completion(candidates={self.candidates}, hint={self.hint})"
+
+
+@lru_cache(maxsize=256)
+def _compiled(spec: Spec) -> Dict[int, CompiledCommand]:
+    return {id(cmd): compile_command(cmd) for cmd in spec.commands}
+
+
+def complete_value(ty: Type, prefix: str, cwd: Optional[str] = None) -> Completion:
+    """Candidates for a value of type `ty` starting with `prefix`"""
+    if ty == Type.BOOL:
+        return Completion([c for c in ("true", "false") if c.startswith(prefix.lower())], "BOOL")
+    if ty == Type.PATH:
+        return Completion(complete_path(prefix, cwd), "PATH")
+    return Completion([], ty.to_string())
+
+
+def complete_path(prefix: str, cwd: Optional[str] = None) -> List[str]:
+    """Directory entries matching `prefix`; directories end with '/'"""
+    dirname, base = os.path.split(prefix)
+    root = os.path.expanduser(dirname) if dirname else "."
+    if cwd and not os.path.isabs(root):
+        root = os.path.join(cwd, root)
+    out: List[str] = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.startswith(base) or (name.startswith(".") and not base.startswith(".")):
+                    continue
+                out.append(os.path.join(dirname, name) + ("/" if entry.is_dir() else ""))
+    except OSError:
+        return []
+    return sorted(out)
+
+
+def complete(spec: Spec, words: Sequence[str], cword: int,
+             cwd: Optional[str] = None) -> Completion:
+    """Complete `words[cword]` (words exclude the program name)
+
+    A `cword` equal to `len(words)` completes a new, empty word.
+    """
+    prefix = words[cword] if cword < len(words) else ""
+    cmd = spec.lookup(words[0]) if cword > 0 and words else spec.default
+    compiled = _compiled(spec)[id(cmd)]
+    options = compiled.options
+
+    # Replay the words before the cursor the way parse_with would
+    seen_pos = 0
+    given = set()
+    after_dashes = False
+    i = 0
+    while i < cword:
+        word = words[i]
+        if after_dashes:
+            seen_pos += 1
+        elif word == "--":
+            after_dashes = True
+        elif word.startswith("-"):
+            name = word.split("=", 1)[0]
+            given.add(name)
+            decl = options.get(name)
+            if isinstance(decl, OptVal) and "=" not in word:
+                if i + 1 == cword:
+                    return complete_value(decl.ty, prefix, cwd)
+                i += 1
+        elif word not in compiled.literals:
+            seen_pos += 1
+        i += 1
+
+    if prefix.startswith("-") and not after_dashes:
+        if "=" in prefix:
+            name, value = prefix.split("=", 1)
+            decl = options.get(name)
+            if not isinstance(decl, OptVal):
+                return Completion([])
+            result = complete_value(decl.ty, value, cwd)
+            result.candidates = [f"{name}={c}" for c in result.candidates]
+            return result
+        names = []
+        for name, decl in options.items():
+            repeatable = isinstance(decl, OptVal) and decl.allow_repeat
+            if name.startswith(prefix) and (repeatable or name not in given):
+                names.append(name)
+        return Completion(sorted(names))
+
+    candidates: List[str] = []
+    hint = None
+    if not after_dashes:
+        literals = spec.index.keys() if cword == 0 else compiled.literals - set(words[:cword])
+        candidates.extend(sorted(lit for lit in literals if lit.startswith(prefix)))
+    if compiled.variadic is not None:
+        seen_pos = min(seen_pos, compiled.variadic)
+    if seen_pos < len(compiled.positionals):
+        name, ty, _ = compiled.positionals[seen_pos]
+        value = complete_value(ty, prefix, cwd)
+        candidates.extend(value.candidates)
+        hint = f"<{name}:{ty.to_string()}>"
+    return Completion(candidates, hint)
+
+
+def handle_request(specs: Dict[str, Spec], payload: bytes) -> bytes:
+    """Answer one wire-protocol request"""
+    fields = payload.decode("utf-8", "surrogateescape").split("\0")
+    if fields and fields[-1] == "":
+        fields.pop()
+    if len(fields) < 3 or fields[0] not in specs:
+        return b""
+    prog, cwd, cword = fields[0], fields[1], fields[2]
+    try:
+        index = int(cword)
+    except ValueError:
+        return b""
+    result = complete(specs[prog], fields[3:], index, cwd or None)
+    return "".join(c + "\n" for c in result.candidates).encode("utf-8", "surrogateescape")
+
+
+def _bind_private(server_cls, socket_path: str, handler):
+    """Bind a Unix socket server that only its owner can connect to
+
+    A stale socket at the path is removed; anything else is refused. The
+    socket is bound inside a fresh 0700 directory next to the path, made
+    0600 and only then renamed into place, so it is never reachable by
+    other users, even briefly.
+    """
+    import tempfile
+
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(st.st_mode):
+            raise FileExistsError(f"Not a socket, refusing to replace: {socket_path}")
+    private = tempfile.mkdtemp(prefix=".clide-", dir=os.path.dirname(socket_path) or ".")
+    staged = os.path.join(private, "sock")
+    server = server_cls(staged, handler, bind_and_activate=False)
+    try:
+        server.server_bind()
+        os.chmod(staged, 0o600)
+        os.replace(staged, socket_path)
+        server.server_address = socket_path
+        server.server_activate()
+    except BaseException:
+        server.server_close()
+        raise
+    finally:
+        if os.path.exists(staged):
+            os.unlink(staged)
+        os.rmdir(private)
+    return server
+
+
+def _same_user(sock: socket.socket) -> bool:
+    """Whether the peer runs as this process's user (True if unknown)"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.geteuid()
+
+
+class CompletionServer:
+    """Serve completions for registered specs over a Unix domain socket"""
+    def __init__(self, socket_path: str, specs: Optional[Dict[str, Spec]] = None):
+        self.socket_path = socket_path
+        self.specs: Dict[str, Spec] = dict(specs or {})
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def add(self, usage: Sequence[str]) -> Spec:
+        """Compile usage lines and serve them under their program name"""
+        spec = compile_spec(usage)
+        _compiled(spec)
+        self.specs[spec.prog] = spec
+        return spec
+
+    def remove(self, prog: str):
+        """Stop serving a program"""
+        self.specs.pop(prog, None)
+
+    def _make_server(self) -> socketserver.ThreadingUnixStreamServer:
+        specs = self.specs
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                if not _same_user(self.request):
+                    return
+                payload = self.rfile.read()
+                self.wfile.write(handle_request(specs, payload))
+
+        server = _bind_private(socketserver.ThreadingUnixStreamServer, self.socket_path, Handler)
+        server.daemon_threads = True
+        return server
+
+    def serve_forever(self):
+        """Serve until shutdown() is called"""
+        self._server = self._make_server()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def start(self) -> threading.Thread:
+        """Serve from a background thread; returns once the socket is bound"""
+        self._server = self._make_server()
+        server = self._server
+
+        def run():
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+
+        thread = threading.Thread(target=run, name="clide-complete", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stop serving and remove the socket"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def query(socket_path: str, prog: str, words: Sequence[str], cword: int,
+          cwd: Optional[str] = None) -> List[str]:
+    """Ask a running CompletionServer for candidates"""
+    fields = [prog, cwd or os.getcwd(), str(cword)] + list(words)
+    payload = "".join(f + "\0" for f in fields).encode("utf-8", "surrogateescape")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(payload)
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks).decode("utf-8", "surrogateescape").splitlines()
+
+
+_BASH_SHIM = r'''_clide_complete_{fn}() {{
+    local line=${{COMP_LINE:0:COMP_POINT}} words cands IFS
+    read -ra words <<< "$line"
+    [[ $line =~ [[:space:]]$ ]] && words+=("")
+    local full=${{words[${{#words[@]}}-1]}}
+    local pre=${{full%"${{COMP_WORDS[COMP_CWORD]}}"}}
+    IFS=$'\n'
+    cands=($(printf '%s\0' {prog} "$PWD" "$(( ${{#words[@]}} - 2 ))" "${{words[@]:1}}" \
+        | socat -t1 - UNIX-CONNECT:{socket} 2>/dev/null))
+    COMPREPLY=("${{cands[@]#"$pre"}}")
+    [[ ${{#COMPREPLY[@]}} -eq 1 && ${{COMPREPLY[0]}} == */ ]] && compopt -o nospace
+}}
+complete -F _clide_complete_{fn} {prog}
+'''
+
+_ZSH_SHIM = r'''_clide_complete_{fn}() {{
+    local -a cands
+    cands=(${{(f)"$(printf '%s\0' {prog} "$PWD" "$(( CURRENT - 2 ))" "${{(@)words[2,-1]}}" \
+        | socat -t1 - UNIX-CONNECT:{socket} 2>/dev/null)"}})
+    compadd -Q -S '' -- $cands
+}}
+compdef _clide_complete_{fn} {prog}
+'''
+
+
+def shim(shell: str, prog: str, socket_path: str) -> str:
+    """Shell functions that forward completion requests to the daemon"""
+    import shlex
+
+    templates = {"bash": _BASH_SHIM, "zsh": _ZSH_SHIM}
+    if shell not in templates:
+        raise ValueError(f"Unsupported shell: {shell}")
+    fn = "".join(c if c.isalnum() else "_" for c in prog)
+    return templates[shell].format(fn=fn, prog=shlex.quote(prog),
+                                   socket=shlex.quote(socket_path))
+
+
+def _read_usage(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip().startswith("Usage:")]
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(prog="python -m clide.complete")
+    sub = ap.add_subparsers(dest="mode", required=True)
+    d = sub.add_parser("daemon", help="serve completions for usage files")
+    d.add_argument("--socket", required=True)
+    d.add_argument("usage_files", nargs="+")
+    s = sub.add_parser("shim", help="print a bash or zsh client shim")
+    s.add_argument("shell", choices=("bash", "zsh"))
+    s.add_argument("prog")
+    s.add_argument("--socket", required=True)
+    q = sub.add_parser("query", help="query a running daemon")
+    q.add_argument("--socket", required=True)
+    q.add_argument("prog")
+    q.add_argument("cword", type=int)
+    q.add_argument("words", nargs="*")
+    opts = ap.parse_args(argv)
+
+    if opts.mode == "daemon":
+        server = CompletionServer(opts.socket)
+        for path in opts.usage_files:
+            server.add(_read_usage(path))
+        server.serve_forever()
+    elif opts.mode == "shim":
+        sys.stdout.write(shim(opts.shell, opts.prog, opts.socket))
+    else:
+        for candidate in query(opts.socket, opts.prog, opts.words, opts.cword):
+            print(candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,67 @@
-"""Clyde help text generator"""
+"""Clyde help text generator
 
-from typing import List, Tuple
+Rendered text is cached per spec (specs are immutable and hashable), so
+repeated `--help` and error-path renders cost a dictionary lookup.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
 from .spec import Spec, Command, Item, Group, Atom, Lit, OptBool, OptVal, Pos, Type
 
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Sequence, Set, Tuple
+
 
 def render(spec: Spec) -> str:
     """Render basic help text from a spec"""
-    result = "Usage:\n"
+    return "Usage:\n" + "".join(_usage_lines(spec))
 
-    for cmd in spec.commands:
-        result += f"  {cmd.name} "
 
-        # Filter out the command literal from items when rendering
-        items_to_render: List[Item] = []
-        for item in cmd.items:
-            # Skip if this is the command literal itself
-            if item.required:
-                atoms = item.group.atoms_list()
-                if len(atoms) == 1 and isinstance(atoms[0], Lit) and atoms[0].value == cmd.name:
+def render_command(spec: Spec, name: str, user_docs: Sequence[Tuple[str, str]] = ()) -> str:
+    """Render help for the commands named `name` only
+
+    Raises KeyError if the spec has no such command.
+    """
+    return _render_command_cached(spec, name, _docs_key(user_docs))
+
+
+@lru_cache(maxsize=256)
+def _usage_lines(spec: Spec) -> Tuple[str, ...]:
+    """One rendered usage line per command, computed once per spec"""
+    return tuple(_usage_line(cmd) for cmd in spec.commands)
+
+
+def _usage_line(cmd: Command) -> str:
+    parts = [f"  {cmd.name} "]
+    for item in cmd.items:
+        # Skip if this is the command literal itself
+        if item.required:
+            atoms = item.group.atoms_list()
+            if len(atoms) == 1 and isinstance(atoms[0], Lit) and atoms[0].value == cmd.name:
+                continue
+            elif len(atoms) > 1:
+                if any(isinstance(a, Lit) and a.value == cmd.name for a in atoms):
                     continue
-                elif len(atoms) > 1:
-                    if any(isinstance(a, Lit) and a.value == cmd.name for a in atoms):
-                        continue
-            items_to_render.append(item)
+        parts.append(show_item(item) + " ")
+    parts.append("\n")
+    return "".join(parts)
 
-        for item in items_to_render:
-            result += show_item(item) + " "
 
-        result += "\n"
+@lru_cache(maxsize=256)
+def _render_command_cached(spec: Spec, name: str, user_docs: Tuple[Tuple[str, str], ...]) -> str:
+    indices = [i for i, cmd in enumerate(spec.commands) if cmd.name == name]
+    if not indices:
+        raise KeyError(name)
+    lines = _usage_lines(spec)
+    usage = "Usage:\n" + "".join(lines[i] for i in indices)
+    synth = _synth_for([spec.commands[i] for i in indices])
+    return f"{usage}\n{render_docs(merge_docs(list(user_docs), synth))}"
 
-    return result
+
+def _docs_key(user_docs: Sequence[Tuple[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((k, v) for k, v in user_docs)
 
 
 def show_item(item: Item) -> str:
@@ -73,7 +105,8 @@ def show_atom(atom: Atom) -> str:
     elif isinstance(atom, Pos):
         t = atom.ty.to_string()
         d = f":{atom.default}" if atom.default else ""
-        return f"<{atom.name}:{t}{d}>"
+        dots = "..." if atom.variadic else ""
+        return f"<{atom.name}:{t}{d}>{dots}"
     else:
         return "?"
 
@@ -106,7 +139,8 @@ def key_string_of_atom(atom: Atom) -> str:
     elif isinstance(atom, Pos):
         t = atom.ty.to_string()
         d = f":{atom.default}" if atom.default else ""
-        return f"<{atom.name}:{t}{d}>"
+        dots = "..." if atom.variadic else ""
+        return f"<{atom.name}:{t}{d}>{dots}"
     elif isinstance(atom, Lit):
         return atom.value
     else:
@@ -127,16 +161,27 @@ def synth_line(atom: Atom) -> Tuple[str, str]:
     elif isinstance(atom, Pos):
         t = atom.ty.to_string()
         d = f" (default {atom.default})" if atom.default else ""
-        return (key_string_of_atom(atom), f"positional {t}{d}")
+        rep = " (variadic)" if atom.variadic else ""
+        return (key_string_of_atom(atom), f"positional {t}{d}{rep}")
     else:
         return ("?", "unknown")
 
 
 def synth_docs(spec: Spec) -> List[Tuple[str, str]]:
     """Synthesize documentation from a spec"""
+    return list(_synth_cached(spec))
+
+
+@lru_cache(maxsize=256)
+def _synth_cached(spec: Spec) -> Tuple[Tuple[str, str], ...]:
+    return tuple(_synth_for(spec.commands))
+
+
+def _synth_for(commands: Sequence[Command]) -> List[Tuple[str, str]]:
     result: List[Tuple[str, str]] = []
+    seen: Set[str] = set()
 
-    for cmd in spec.commands:
+    for cmd in commands:
         # Include leading command literal if present
         if cmd.items:
             first_item = cmd.items[0]
@@ -144,34 +189,24 @@ def synth_docs(spec: Spec) -> List[Tuple[str, str]]:
                 atoms = first_item.group.atoms_list()
                 if len(atoms) == 1 and isinstance(atoms[0], Lit):
                     s = atoms[0].value
-                    if not any(k == s for k, _ in result):
+                    if s not in seen:
+                        seen.add(s)
                         result.append((s, "command"))
 
-        # Collect all atoms
-        atoms: List[Atom] = []
         for item in cmd.items:
-            atoms.extend(item.group.atoms_list())
-
-        for atom in atoms:
-            key, desc = synth_line(atom)
-            if not any(k == key for k, _ in result):
-                result.append((key, desc))
+            for atom in item.group.atoms_list():
+                key, desc = synth_line(atom)
+                if key not in seen:
+                    seen.add(key)
+                    result.append((key, desc))
 
     return result
 
 
 def merge_docs(user: List[Tuple[str, str]], synth: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
     """Merge user documentation with synthesized documentation"""
-    result: List[Tuple[str, str]] = []
     user_dict = dict(user)
-
-    for k, autov in synth:
-        if k in user_dict:
-            result.append((k, user_dict[k]))
-        else:
-            result.append((k, autov))
-
-    return result
+    return [(k, user_dict.get(k, autov)) for k, autov in synth]
 
 
 def render_docs(pairs: List[Tuple[str, str]]) -> str:
@@ -179,19 +214,23 @@ def render_docs(pairs: List[Tuple[str, str]]) -> str:
     if not pairs:
         return ""
 
-    max_len = max(len(k) for k, _ in pairs) if pairs else 0
+    max_len = max(len(k) for k, _ in pairs)
 
-    result = "Options & Arguments:\n"
+    lines = ["Options & Arguments:\n"]
     for key, desc in pairs:
         padding = " " * (max_len - len(key))
-        result += f"  {key}{padding}  -  {desc}\n"
+        lines.append(f"  {key}{padding}  -  {desc}\n")
 
-    return result
+    return "".join(lines)
 
 
-def render_with_docs(spec: Spec, user_docs: List[Tuple[str, str]]) -> str:
+def render_with_docs(spec: Spec, user_docs: Sequence[Tuple[str, str]]) -> str:
     """Render help text with user-provided documentation"""
+    return _render_with_docs_cached(spec, _docs_key(user_docs))
+
+
+@lru_cache(maxsize=256)
+def _render_with_docs_cached(spec: Spec, user_docs: Tuple[Tuple[str, str], ...]) -> str:
     usage = render(spec)
-    synth = synth_docs(spec)
-    merged = merge_docs(user_docs, synth)
+    merged = merge_docs(list(user_docs), list(_synth_cached(spec)))
     return f"{usage}\n{render_docs(merged)}"
@@ -0,0 +1,269 @@
+"""Clyde incremental parser
+
+`IncrementalParser` accepts argv one token at a time and keeps the token
+loop's state between calls, so validating a line as it is typed costs one
+token of work per keystroke instead of a full re-parse. Feeding the tokens
+of an argv and calling `finish()` gives the same result, or raises the same
+ArgError, as `parse_with` on the whole argv.
+
+`fork()` copies the state in time proportional to the number of distinct
+options and positionals seen; option value lists and leftovers are shared
+and copied on the next write. Keep a fork of the committed tokens and feed
+the word being edited into a throwaway fork:
+
+    base = parser.incremental()
+    for token in committed:
+        base.feed(token)
+    trial = base.fork()
+    trial.feed(current_word)
+"""
+
+from __future__ import annotations
+
+from .runtime import (ArgError, ArgvView, CompiledSpec, ParseResult, _use_default, _variadic_empty,
+                      compact_values)
+from .spec import OptBool
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+    from .runtime import CompiledCommand
+    from .spec import Spec, Type
+
+
+class ParseState:
+    """A read-only view of an incremental parser between tokens
+
+    `pending` names the option waiting for its value; `next_positional` is
+    the (name, type) the next plain token fills; `satisfied` lists the
+    required literals and positionals already given and `missing` the
+    positionals that have neither a value nor a default.
+    """
+    __slots__ = ("command", "pending", "next_positional", "satisfied", "missing",
+                 "after_dashes", "tokens")
+
+    def __init__(self, command: Optional[str], pending: Optional[str],
+                 next_positional: Optional[Tuple[str, Type]], satisfied: Tuple[str, ...],
+                 missing: Tuple[str, ...], after_dashes: bool, tokens: int):
+        self.command = command
+        self.pending = pending
+        self.next_positional = next_positional
+        self.satisfied = satisfied
+        self.missing = missing
+        self.after_dashes = after_dashes
+        self.tokens = tokens
+
+    @property
+    def complete(self) -> bool:
+        """Whether finish() would find every requirement met"""
+        return self.pending is None and not self.missing
+
+    def __repr__(self):
+        return (f"ParseState(command={self.command}, pending={self.pending}, "
+                f"next_positional={self.next_positional}, missing={self.missing})")
+
+
+class IncrementalParser:
+    """Push-style parser: feed(token) per argv entry, then finish()"""
+    __slots__ = ("_parser", "_cmd", "_opts", "_owned", "_pos", "_seen_pos",
+                 "_literals_seen", "_pending", "_after_dashes", "_leftovers", "_own_leftovers",
+                 "_tokens")
+
+    def __init__(self, parser: Union[CompiledSpec, Spec], typed: bool = False):
+        if not isinstance(parser, CompiledSpec):
+            parser = CompiledSpec(parser, typed=typed)
+        if parser.strict:
+            raise ValueError("IncrementalParser does not support strict parsers")
+        self._parser = parser
+        self._cmd: Optional[CompiledCommand] = None
+        self._opts: Dict[str, List[object]] = {}
+        self._owned: Set[str] = set()
+        self._pos: Dict[str, object] = {}
+        self._seen_pos = 0
+        self._literals_seen: Tuple[str, ...] = ()
+        self._pending: Optional[str] = None
+        self._after_dashes = False
+        self._leftovers: List[str] = []
+        self._own_leftovers = True
+        self._tokens = 0
+
+    @property
+    def command(self) -> CompiledCommand:
+        """The command being parsed; the spec default until a token is fed"""
+        if self._cmd is None:
+            return self._parser.commands[id(self._parser.spec.default)]
+        return self._cmd
+
+    def feed(self, token: str):
+        """Consume one argv token
+
+        Raises ArgError exactly where parse_with would; the parser is left
+        unchanged by a token that fails. Repeatable option values are kept
+        even when the parser has an on_repeat callback.
+        """
+        cmd = self._cmd
+        if cmd is None:
+            spec = self._parser.spec
+            cmd = self._parser.commands[id(spec.lookup(token))]
+
+        if self._pending is not None:
+            name = self._pending
+            decl = cmd.options[name]
+            self._add_option(cmd, name, cmd.convert(decl.ty, token))
+            self._pending = None
+        elif self._after_dashes:
+            if self._seen_pos == cmd.variadic:
+                name, ty, _ = cmd.positionals[self._seen_pos]
+                self._append(self._pos, name, cmd.convert(ty, token))
+            elif self._seen_pos < len(cmd.positionals):
+                name, ty, _ = cmd.positionals[self._seen_pos]
+                self._pos[name] = cmd.convert(ty, token)
+                self._seen_pos += 1
+            elif self._own_leftovers:
+                self._leftovers.append(token)
+            else:
+                self._leftovers = self._leftovers + [token]
+                self._own_leftovers = True
+        elif token == "--":
+            self._after_dashes = True
+        elif token.startswith('-'):
+            if '=' in token:
+                pos = token.find('=')
+                name = token[:pos]
+                val = token[pos + 1:]
+            else:
+                name = token
+                val = None
+
+            decl = cmd.options.get(name)
+            if decl is None:
+                raise cmd.unknown_option(name)
+            if isinstance(decl, OptBool):
+                self._add_option(cmd, name, cmd.true_val)
+            elif val is not None:
+                self._add_option(cmd, name, cmd.convert(decl.ty, val))
+            else:
+                self._pending = name
+        elif token in cmd.literals:
+            if token not in self._literals_seen:
+                self._literals_seen += (token,)
+        else:
+            if self._seen_pos >= len(cmd.positionals):
+                raise ArgError(f"Unexpected argument: {token}")
+            name, ty, _ = cmd.positionals[self._seen_pos]
+            if self._seen_pos == cmd.variadic:
+                self._append(self._pos, name, cmd.convert(ty, token))
+            else:
+                self._pos[name] = cmd.convert(ty, token)
+                self._seen_pos += 1
+        self._cmd = cmd
+        self._tokens += 1
+
+    def feed_all(self, tokens: Iterable[str]) -> IncrementalParser:
+        """Feed several tokens; returns self for chaining"""
+        for token in tokens:
+            self.feed(token)
+        return self
+
+    def _add_option(self, cmd: CompiledCommand, name: str, value: object):
+        cap = cmd.max_repeats
+        if cap is not None and name in cmd.repeatable and len(self._opts.get(name, ())) >= cap:
+            raise ArgError(f"Too many values for {name} (limit {cap})")
+        self._append(self._opts, name, value)
+
+    def _append(self, table: Dict[str, List[object]], name: str, value: object):
+        # Option names start with '-', so they never clash with positional names
+        vals = table.get(name)
+        if vals is None:
+            table[name] = [value]
+            self._owned.add(name)
+        elif name in self._owned:
+            vals.append(value)
+        else:
+            table[name] = vals + [value]
+            self._owned.add(name)
+
+    def state(self) -> ParseState:
+        """The current state without consuming anything"""
+        cmd = self.command
+        next_positional = None
+        if self._seen_pos < len(cmd.positionals):
+            name, ty, _ = cmd.positionals[self._seen_pos]
+            next_positional = (name, ty)
+        filled = tuple(name for name, _, _ in cmd.positionals if name in self._pos)
+        missing = tuple(name for slot, (name, _, default) in enumerate(cmd.positionals)
+                        if name not in self._pos and default is None and
+                        (slot != cmd.variadic or cmd.variadic_required))
+        return ParseState(
+            command=cmd.name if self._cmd is not None else None,
+            pending=self._pending,
+            next_positional=next_positional,
+            satisfied=self._literals_seen + filled,
+            missing=missing,
+            after_dashes=self._after_dashes,
+            tokens=self._tokens,
+        )
+
+    def fork(self) -> IncrementalParser:
+        """An independent copy; feeding one does not affect the other"""
+        other = IncrementalParser.__new__(IncrementalParser)
+        other._parser = self._parser
+        other._cmd = self._cmd
+        other._opts = dict(self._opts)
+        other._owned = set()
+        self._owned = set()
+        other._pos = dict(self._pos)
+        other._seen_pos = self._seen_pos
+        other._literals_seen = self._literals_seen
+        other._pending = self._pending
+        other._after_dashes = self._after_dashes
+        other._leftovers = self._leftovers
+        other._own_leftovers = self._own_leftovers = False
+        other._tokens = self._tokens
+        return other
+
+    __copy__ = fork
+
+    def finish(self) -> ParseResult:
+        """Apply defaults and return the result; the parser can keep feeding"""
+        cmd = self.command
+        if self._pending is not None:
+            raise ArgError(f"Missing value for {self._pending}")
+
+        opts_map = {name: compact_values(vals) if name in cmd.compact else list(vals)
+                    for name, vals in self._opts.items()}
+        pos_map = dict(self._pos)
+        if cmd.variadic is not None:
+            name = cmd.positionals[cmd.variadic][0]
+            if name in pos_map:
+                pos_map[name] = list(pos_map[name])
+        if self._after_dashes:
+            for slot in range(self._seen_pos, len(cmd.positionals)):
+                name, _, default = cmd.positionals[slot]
+                if slot == cmd.variadic:
+                    if name not in pos_map:
+                        pos_map[name] = _variadic_empty(cmd, name, default)
+                elif default is None:
+                    raise ArgError(f"Missing positional: {name}")
+                else:
+                    pos_map[name] = _use_default(default)
+
+        for key, default in cmd.defaults:
+            if default is not None and key not in opts_map:
+                opts_map[key] = [_use_default(default)]
+        for slot, (name, _, default) in enumerate(cmd.positionals):
+            if name not in pos_map:
+                if slot == cmd.variadic:
+                    pos_map[name] = _variadic_empty(cmd, name, default)
+                elif default is None:
+                    raise ArgError(f"Missing positional: {name}")
+                else:
+                    pos_map[name] = _use_default(default)
+        if cmd.stream and cmd.variadic is not None:
+            name = cmd.positionals[cmd.variadic][0]
+            pos_map[name] = iter(pos_map[name])
+        # Later feeds only append past the view or replace the list, so no copy
+        return ParseResult(cmd.name, opts_map, pos_map, ArgvView(self._leftovers))
+
+    def __repr__(self):
+        return f"IncrementalParser(command={self.command.name}, tokens={self._tokens})"
@@ -0,0 +1,331 @@
+"""Clyde warm launcher
+
+`LaunchServer` keeps a compiled parser, the application's modules and
+every cache warm in one resident process. A client forwards its argv,
+environment and working directory over a Unix domain socket, passing its
+stdin, stdout and stderr as file descriptors (SCM_RIGHTS). The server
+parses the argv, forks a worker that adopts the client's descriptors,
+environment and directory, runs the handler on the ParseResult, and sends
+the exit status back. A parse error is written to the client's stderr and
+exits with status 2 without forking.
+
+    python -m clide.launcher serve --socket ~/.cache/tool.sock tool.cli:run tool.usage &
+    python -m clide.launcher run --socket ~/.cache/tool.sock -- deploy prod
+
+The client imports only os, socket, struct and sys, so a forwarded run
+costs a bare interpreter start plus a round trip instead of importing the
+application. Signals sent to the client are not forwarded to the worker.
+
+The socket is bound mode 0600 and, where the platform reports peer
+credentials (SO_PEERCRED), connections from other users are dropped
+before anything is read. Requests are received one at a time on the
+accept loop, so a connected client that sends nothing holds up the
+others for up to REQUEST_TIMEOUT seconds; the client writes its whole
+request immediately after connecting.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import struct
+import sys
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+    from .runtime import CompiledSpec, ParseResult
+
+# Protocol version; the first field of every request
+MAGIC = b"clide-launch-1"
+
+_HEADER = struct.Struct("!I")
+_STATUS = struct.Struct("!i")
+_FDS = struct.Struct("3i")
+
+# Seconds a connected client has to send its request
+REQUEST_TIMEOUT = 2.0
+
+
+def _encode_request(argv: Sequence[str], env: Mapping[str, str], cwd: str) -> bytes:
+    fields = [MAGIC, os.fsencode(cwd), str(len(argv)).encode()]
+    fields.extend(os.fsencode(arg) for arg in argv)
+    fields.extend(os.fsencode(k) + b"=" + os.fsencode(v) for k, v in env.items())
+    return b"".join(field + b"\0" for field in fields)
+
+
+def _decode_request(body: bytes) -> Tuple[List[str], Dict[str, str], str]:
+    fields = body.split(b"\0")[:-1]
+    if len(fields) < 3 or fields[0] != MAGIC:
+        raise ValueError("not a clide launcher request")
+    cwd = os.fsdecode(fields[1])
+    argc = int(fields[2])
+    argv = [os.fsdecode(f) for f in fields[3:3 + argc]]
+    env = {}
+    for entry in fields[3 + argc:]:
+        key, _, value = os.fsdecode(entry).partition("=")
+        env[key] = value
+    return argv, env, cwd
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("client closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive(sock: socket.socket) -> Tuple[List[int], bytes]:
+    """The client's descriptors and request body"""
+    header, ancdata, _, _ = sock.recvmsg(_HEADER.size, socket.CMSG_SPACE(_FDS.size))
+    fds: List[int] = []
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            usable = len(data) - len(data) % 4
+            fds.extend(struct.unpack(f"{usable // 4}i", data[:usable]))
+    try:
+        if len(header) < _HEADER.size:
+            header += _recv_exactly(sock, _HEADER.size - len(header))
+        if len(fds) != 3:
+            raise ValueError("expected stdin, stdout and stderr descriptors")
+        (length,) = _HEADER.unpack(header)
+        return fds, _recv_exactly(sock, length)
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+
+def launch(socket_path: str, argv: Sequence[str], env: Optional[Mapping[str, str]] = None,
+           cwd: Optional[str] = None, stdio: Sequence[int] = (0, 1, 2)) -> int:
+    """Run argv in a LaunchServer's worker; returns its exit status"""
+    body = _encode_request(argv, os.environ if env is None else env, cwd or os.getcwd())
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendmsg([_HEADER.pack(len(body))],
+                     [(socket.SOL_SOCKET, socket.SCM_RIGHTS, _FDS.pack(*stdio))])
+        sock.sendall(body)
+        status = b""
+        while len(status) < _STATUS.size:
+            chunk = sock.recv(_STATUS.size - len(status))
+            if not chunk:
+                # The worker died without reporting, e.g. from a signal
+                return 1
+            status += chunk
+    return _STATUS.unpack(status)[0]
+
+
+def _exit_code(value: object) -> int:
+    """The exit status for a handler's return value or SystemExit code
+
+    As for sys.exit: None is 0, an int is itself, and anything else is
+    printed to stderr and gives 1.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return int(value)
+    print(value, file=sys.stderr)
+    return 1
+
+
+class LaunchServer:
+    """Parse forwarded argvs in a warm process and run each in a forked worker
+
+    `handler(result)` runs in the worker with the client's stdio,
+    environment, directory and `sys.argv`; its return value (or SystemExit
+    code) is the exit status, interpreted as sys.exit does. `preload`
+    names modules to import up front.
+    """
+    def __init__(self, socket_path: str, parser: CompiledSpec,
+                 handler: Callable[[ParseResult], Optional[int]], preload: Sequence[str] = ()):
+        self.socket_path = socket_path
+        self.parser = parser
+        self.handler = handler
+        for module in preload:
+            __import__(module)
+        self._server = None
+
+    def _serve_one(self, conn: socket.socket, listener: socket.socket):
+        from .complete import _same_user
+        from .runtime import ArgError
+
+        if not _same_user(conn):
+            return
+        conn.settimeout(REQUEST_TIMEOUT)
+        try:
+            fds, body = _receive(conn)
+        except (OSError, ValueError):
+            return
+        try:
+            argv, env, cwd = _decode_request(body)
+            try:
+                result = self.parser(argv)
+            except ArgError as e:
+                message = f"{self.parser.spec.prog}: {e}\n"
+                if e.hint:
+                    message += e.hint + "\n"
+                os.write(fds[2], message.encode("utf-8", "replace"))
+                conn.sendall(_STATUS.pack(2))
+                return
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    listener.close()
+                    self._run_worker(conn, fds, result, argv, env, cwd)
+                finally:
+                    # The worker must never return into the server loop
+                    os._exit(1)
+        except (OSError, ValueError):
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _run_worker(self, conn: socket.socket, fds: Sequence[int], result: ParseResult,
+                    argv: Sequence[str], env: Mapping[str, str], cwd: str):
+        """Adopt the client's context, run the handler and never return"""
+        code = 1
+        try:
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            # Fresh streams, buffered for the client's terminal or pipe
+            sys.stdin = open(0, "r", closefd=False)
+            sys.stdout = open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+            sys.stderr = open(2, "w", buffering=1, errors="backslashreplace", closefd=False)
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(env)
+            sys.argv = [self.parser.spec.prog] + list(argv)
+            code = _exit_code(self.handler(result))
+        except SystemExit as e:
+            code = _exit_code(e.code)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            # code is always an int here, so computing the status cannot raise
+            status = code & 0xFF
+            try:
+                for stream in (sys.stdout, sys.stderr):
+                    try:
+                        stream.flush()
+                    except Exception:
+                        pass
+                conn.sendall(_STATUS.pack(status))
+            finally:
+                os._exit(status)
+
+    def _make_server(self):
+        import socketserver
+
+        launcher = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                launcher._serve_one(self.request, self.server.socket)
+
+        class Server(socketserver.UnixStreamServer):
+            def shutdown_request(self, request):
+                # Only close: shutting the socket down would also end the
+                # worker's copy before it sends the exit status
+                self.close_request(request)
+
+            def service_actions(self):
+                # Reap finished workers
+                try:
+                    while os.waitpid(-1, os.WNOHANG)[0]:
+                        pass
+                except ChildProcessError:
+                    pass
+
+        from .complete import _bind_private
+
+        return _bind_private(Server, self.socket_path, Handler)
+
+    def serve_forever(self):
+        """Serve until shutdown() is called"""
+        self._server = self._make_server()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def start(self):
+        """Serve from a background thread; returns once the socket is bound"""
+        import threading
+
+        self._server = self._make_server()
+        server = self._server
+
+        def run():
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+
+        thread = threading.Thread(target=run, name="clide-launcher", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stop serving and remove the socket"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def _load_handler(target: str) -> Callable[[ParseResult], Optional[int]]:
+    import importlib
+
+    module, _, attr = target.partition(":")
+    if not attr:
+        raise SystemExit(f"handler must be 'module:function': {target}")
+    return getattr(importlib.import_module(module), attr)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    # The client path avoids argparse and the rest of clide
+    if len(args) >= 3 and args[0] == "run" and args[1] == "--socket":
+        rest = args[3:]
+        if rest[:1] == ["--"]:
+            rest = rest[1:]
+        sys.exit(launch(args[2], rest))
+
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m clide.launcher")
+    sub = ap.add_subparsers(dest="mode", required=True)
+    s = sub.add_parser("serve", help="serve a handler for a usage file")
+    s.add_argument("--socket", required=True)
+    s.add_argument("--preload", action="append", default=[], help="module to import up front")
+    s.add_argument("handler", help="module:function called with the ParseResult")
+    s.add_argument("usage_file")
+    r = sub.add_parser("run", help="run argv in a serving launcher")
+    r.add_argument("--socket", required=True)
+    r.add_argument("argv", nargs=argparse.REMAINDER)
+    opts = ap.parse_args(args)
+
+    if opts.mode == "serve":
+        from . import Clyde
+        from .complete import _read_usage
+
+        parser = Clyde.from_usage_lines(_read_usage(opts.usage_file))
+        LaunchServer(opts.socket, parser, _load_handler(opts.handler),
+                     preload=opts.preload).serve_forever()
+    else:
+        sys.exit(launch(opts.socket, opts.argv))
+
+
+if __name__ == "__main__":
+    main()
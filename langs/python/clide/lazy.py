@@ -0,0 +1,221 @@
+"""Clyde lazily loaded subcommands
+
+A `LazySpec` is assembled from per-subcommand usage sources registered by
+command path (`"deploy"`, `"remote add"`). A source is only loaded and
+compiled when an argv selects its path, so a CLI with hundreds of
+subcommands spread over many modules pays for the one that runs:
+
+    cli = LazySpec("ops")
+    cli.register("remote add", "ops.remote:ADD_USAGE", summary="Add a remote")
+    cli.register("deploy", lambda: ["Usage: ops deploy <env:STR>"], summary="Deploy")
+    result = cli.parse(sys.argv[1:])
+
+A source is a list of usage lines, a callable returning them, or a
+`"module:attribute"` string that is imported on first use. `help()` lists
+every command from the registered paths and summaries without loading
+any source.
+"""
+
+from __future__ import annotations
+
+from .parser import ParseError
+from .runtime import ArgError, CompiledSpec, ParseResult, choose_command
+from .spec import Lit
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+    from .runtime import CompiledCommand
+    from .spec import Command, Spec
+    from .suggest import SuggestionIndex
+
+    Source = Union[Sequence[str], Callable[[], Sequence[str]], str]
+
+
+class _Entry:
+    """One registered command path and, once loaded, its compiled spec"""
+    __slots__ = ("path", "source", "summary", "parser")
+
+    def __init__(self, path: Tuple[str, ...], source: Source, summary: str):
+        self.path = path
+        self.source = source
+        self.summary = summary
+        self.parser: Optional[CompiledSpec] = None
+
+    @property
+    def name(self) -> str:
+        return " ".join(self.path)
+
+
+def _load_lines(source: Source) -> List[str]:
+    if isinstance(source, str):
+        module, _, attr = source.partition(":")
+        if not attr:
+            raise ParseError(f"Usage source must be 'module:attribute': {source}")
+        import importlib
+        value = getattr(importlib.import_module(module), attr)
+        return list(value() if callable(value) else value)
+    if callable(source):
+        return list(source())
+    return list(source)
+
+
+def _leading_literals(cmd: Command) -> List[str]:
+    """The literal words a command starts with, skipping optional items"""
+    words = []
+    for item in cmd.items:
+        if not item.required:
+            continue
+        atoms = item.group.atoms_list()
+        if len(atoms) != 1 or not isinstance(atoms[0], Lit):
+            break
+        words.append(atoms[0].value)
+    return words
+
+
+class LazySpec:
+    """Subcommand usage sources keyed by command path, compiled on demand
+
+    `typed` and `strict` are passed to each subcommand's CompiledSpec. A
+    source registered under the empty path `""` is used when argv names no
+    registered command.
+    """
+
+    def __init__(self, prog: str, typed: bool = False, strict: bool = False):
+        self.prog = prog
+        self.typed = typed
+        self.strict = strict
+        self._entries: Dict[Tuple[str, ...], _Entry] = {}
+        # Path prefix -> the words that can follow it
+        self._children: Dict[Tuple[str, ...], Set[str]] = {}
+        self._depth = 0
+        # Path prefix -> suggestion index over its children, built on a miss
+        self._indexes: Dict[Tuple[str, ...], SuggestionIndex] = {}
+
+    def register(self, path: Union[str, Sequence[str]], source: Source, summary: str = ""):
+        """Register the usage source for a command path such as "remote add"
+
+        The source's usage lines must use this prog and start with every
+        word of the path as literals (optional items may come between);
+        that is checked when it is loaded.
+        """
+        words = tuple(path.split() if isinstance(path, str) else path)
+        self._entries[words] = _Entry(words, source, summary)
+        for n in range(len(words)):
+            self._children.setdefault(words[:n], set()).add(words[n])
+        self._depth = max(self._depth, len(words))
+        self._indexes.clear()
+
+    def commands(self) -> List[str]:
+        """Registered command paths in registration order"""
+        return [entry.name for entry in self._entries.values() if entry.path]
+
+    def loaded(self) -> List[str]:
+        """Command paths whose sources have been loaded"""
+        return [entry.name for entry in self._entries.values() if entry.parser is not None]
+
+    def select(self, argv: Sequence[str]) -> Tuple[str, CompiledSpec]:
+        """The (command path, parser) argv selects, loading it if needed"""
+        entry = self._select(argv)
+        parser = entry.parser
+        if parser is None:
+            parser = entry.parser = self._compile(entry)
+        return entry.name, parser
+
+    def choose_command(self, argv: Sequence[str]) -> CompiledCommand:
+        """The compiled command argv selects, as choose_command does for a Spec"""
+        _, parser = self.select(argv)
+        return parser.commands[id(choose_command(parser.spec, argv))]
+
+    def parse(self, argv: Sequence[str]) -> ParseResult:
+        """Parse argv; the result's command is the full path, e.g. `remote add`"""
+        name, parser = self.select(argv)
+        result = parser.parse(argv)
+        if name:
+            result.command = name
+        return result
+
+    __call__ = parse
+
+    def spec_for(self, path: Union[str, Sequence[str]]) -> Spec:
+        """Load and return the Spec of one command path"""
+        words = tuple(path.split() if isinstance(path, str) else path)
+        entry = self._entries.get(words)
+        if entry is None:
+            raise KeyError(" ".join(words))
+        if entry.parser is None:
+            entry.parser = self._compile(entry)
+        return entry.parser.spec
+
+    def help(self) -> str:
+        """List every command from the registered paths and summaries only"""
+        from .help import render_docs
+
+        names = self.commands()
+        usage = "Usage:\n" + "".join(f"  {name} ...\n" for name in names)
+        docs = [(entry.name, entry.summary) for entry in self._entries.values()
+                if entry.path and entry.summary]
+        return f"{usage}\n{render_docs(docs)}" if docs else usage
+
+    def help_for(self, argv: Sequence[str]) -> str:
+        """Full help for the command argv selects, or the command list"""
+        from .help import render
+
+        try:
+            _, parser = self.select(argv)
+        except ArgError:
+            return self.help()
+        return render(parser.spec)
+
+    def _select(self, argv: Sequence[str]) -> _Entry:
+        for n in range(min(len(argv), self._depth), 0, -1):
+            entry = self._entries.get(tuple(argv[:n]))
+            if entry is not None:
+                return entry
+        entry = self._entries.get(())
+        if entry is not None:
+            return entry
+        if not argv:
+            raise ArgError("Missing command")
+        prefix: Tuple[str, ...] = ()
+        for word in argv:
+            if (prefix + (word,)) not in self._children:
+                break
+            prefix += (word,)
+        suggestions: List[str] = []
+        if len(prefix) < len(argv) and prefix in self._children:
+            suggestions = self._suggest(prefix, argv[len(prefix)])
+        if prefix:
+            expected = "|".join(sorted(self._children[prefix]))
+            raise ArgError(f"Incomplete command: {' '.join(prefix)} (expected {expected})",
+                           suggestions)
+        raise ArgError(f"Unknown command: {argv[0]}", suggestions)
+
+    def _suggest(self, prefix: Tuple[str, ...], word: str) -> List[str]:
+        """Words close to word that can follow prefix"""
+        index = self._indexes.get(prefix)
+        if index is None:
+            from .suggest import SuggestionIndex
+            index = self._indexes[prefix] = SuggestionIndex(sorted(self._children[prefix]))
+        return index.suggest(word)
+
+    def _compile(self, entry: _Entry) -> CompiledSpec:
+        from .cache import compile_spec
+
+        spec = compile_spec(_load_lines(entry.source))
+        if spec.prog != self.prog:
+            raise ParseError(f"Usage for '{entry.name}' is for {spec.prog}, not {self.prog}")
+        if entry.path:
+            for cmd in spec.commands:
+                if tuple(_leading_literals(cmd)[:len(entry.path)]) != entry.path:
+                    raise ParseError(f"Usage for '{entry.name}' must start with {entry.name}")
+        return CompiledSpec(spec, typed=self.typed, strict=self.strict)
+
+    def __contains__(self, path: Union[str, Sequence[str]]) -> bool:
+        return tuple(path.split() if isinstance(path, str) else path) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"LazySpec(prog={self.prog}, commands={len(self._entries)})"
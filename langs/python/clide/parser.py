@@ -1,7 +1,13 @@
 """Clyde usage string parser"""
 
-from typing import List, Tuple, Optional
-from .spec import Spec, Command, Item, Group, Atom, Lit, OptBool, OptVal, Pos, Type
+from __future__ import annotations
+
+from .spec import (Spec, Command, Item, Group, Atom, Lit, OptBool, OptVal, Pos, Type,
+                   first_literal_of)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Optional, Tuple
 
 
 class ParseError(Exception):
@@ -43,6 +49,16 @@ def parse_usage_line(line: str) -> Tuple[str, List[Item]]:
     for token in rest:
         items.append(parse_group_token(token))
 
+    variadic = None
+    for item in items:
+        for atom in item.group.atoms_list():
+            if isinstance(atom, Pos):
+                if variadic is not None:
+                    raise ParseError(f"Variadic positional must be last: <{variadic.name}:"
+                                     f"{variadic.ty.to_string()}>...")
+                if atom.variadic:
+                    variadic = atom
+
     return (prog, items)
 
 
@@ -70,7 +86,7 @@ def parse_group_token(token: str) -> Item:
 def atom_of(token: str) -> Atom:
     """Parse a token into an Atom"""
     if token.startswith('<'):
-        if not token.endswith('>'):
+        if not token.endswith('>') and not token.endswith('>...'):
             raise ParseError(f"Unterminated positional: {token}")
         return parse_pos(token)
     elif is_long(token) or is_short(token) or '=' in token:
@@ -127,11 +143,13 @@ def parse_option(token: str) -> Atom:
 
 
 def parse_pos(token: str) -> Atom:
-    """Parse a positional argument token"""
-    if not token.startswith('<') or not token.endswith('>'):
+    """Parse a positional argument token; a trailing `...` makes it variadic"""
+    variadic = token.endswith('>...')
+    core = token[:-3] if variadic else token
+    if not core.startswith('<') or not core.endswith('>'):
         raise ParseError(f"Expected <...>: {token}")
 
-    inside = token[1:-1]
+    inside = core[1:-1]
     parts = inside.split(':')
 
     if len(parts) == 2:
@@ -140,14 +158,14 @@ def parse_pos(token: str) -> Atom:
             ty = Type.from_str(ty_str)
         except ValueError as e:
             raise ParseError(f"{e}: {token}")
-        return Pos(name=name, ty=ty, default=None)
+        return Pos(name=name, ty=ty, default=None, variadic=variadic)
     elif len(parts) == 3:
         name, ty_str, default = parts
         try:
             ty = Type.from_str(ty_str)
         except ValueError as e:
             raise ParseError(f"{e}: {token}")
-        return Pos(name=name, ty=ty, default=default)
+        return Pos(name=name, ty=ty, default=default, variadic=variadic)
     else:
         raise ParseError(f"Bad positional: {token}")
 
@@ -164,13 +182,4 @@ def is_long(s: str) -> bool:
 
 def first_lit_after_prog(items: List[Item]) -> Optional[str]:
     """Find the first literal atom after the program name"""
-    for item in items:
-        if item.required:
-            atoms = item.group.atoms_list()
-            if len(atoms) == 1 and isinstance(atoms[0], Lit):
-                return atoms[0].value
-            elif len(atoms) > 1:
-                for atom in atoms:
-                    if isinstance(atom, Lit):
-                        return atom.value
-    return None
+    return first_literal_of(items)
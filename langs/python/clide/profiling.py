@@ -0,0 +1,133 @@
+"""Clyde parser instrumentation
+
+Every `CompiledSpec` carries a `Profiler`. It is off by default, which
+costs one attribute check per parse; turn it on with `profiler.enable()`
+or by setting `CLIDE_PROFILE=1` before the parser is built. When enabled
+it records time per phase (compile, choose_command, tokens, convert,
+defaults), parse and error counts, unknown-option hits and result-cache
+hits, exportable as a dict or in the Prometheus text format. A parse
+answered from the result cache counts as a parse and a cache hit, with no
+phase time.
+"""
+
+from __future__ import annotations
+
+import os
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Tuple
+
+PROFILE_ENV = "CLIDE_PROFILE"
+
+PHASES = ("compile", "choose_command", "tokens", "convert", "defaults")
+
+# ArgError message prefix -> error kind label
+_ERROR_KINDS: Tuple[Tuple[str, str], ...] = (
+    ("Unknown option", "unknown_option"),
+    ("Missing value", "missing_value"),
+    ("Missing positional", "missing_positional"),
+    ("Unexpected argument", "unexpected_argument"),
+    ("Expected INT", "bad_int"),
+    ("Expected BOOL", "bad_bool"),
+)
+
+
+def env_enabled() -> bool:
+    """Whether CLIDE_PROFILE asks for profiling"""
+    return os.environ.get(PROFILE_ENV, "").lower() not in ("", "0", "false", "no")
+
+
+def error_kind(exc: BaseException) -> str:
+    """Classify a parse failure into a stable label"""
+    message = getattr(exc, "message", None)
+    if message is None:
+        return type(exc).__name__
+    for prefix, kind in _ERROR_KINDS:
+        if message.startswith(prefix):
+            return kind
+    return "other"
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Profiler:
+    """Phase timings and counters for one parser"""
+    def __init__(self, name: str = "", enabled: bool = False):
+        self.name = name
+        self.enabled = enabled
+        self.reset()
+
+    def enable(self):
+        """Start recording"""
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording (collected data is kept)"""
+        self.enabled = False
+
+    def reset(self):
+        """Clear all timings and counters except compile time"""
+        compile_time = getattr(self, "seconds", {}).get("compile", 0.0)
+        self.seconds: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.seconds["compile"] = compile_time
+        self.parses = 0
+        self.cache_hits = 0
+        self.errors: Dict[str, int] = {}
+        self.unknown_options: Dict[str, int] = {}
+
+    def record_error(self, exc: BaseException):
+        """Count a failed parse"""
+        kind = error_kind(exc)
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+        if kind == "unknown_option":
+            name = exc.message.split(": ", 1)[-1]
+            self.unknown_options[name] = self.unknown_options.get(name, 0) + 1
+
+    def as_dict(self) -> Dict[str, object]:
+        """Snapshot of all counters"""
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "parses": self.parses,
+            "cache_hits": self.cache_hits,
+            "errors": dict(self.errors),
+            "error_total": sum(self.errors.values()),
+            "unknown_options": dict(self.unknown_options),
+            "seconds": dict(self.seconds),
+        }
+
+    def to_prometheus(self, prefix: str = "clide") -> str:
+        """Render counters in the Prometheus text exposition format"""
+        base = f'prog="{_label(self.name)}"'
+        out: List[str] = []
+
+        out.append(f"# HELP {prefix}_parses_total Successful parses.")
+        out.append(f"# TYPE {prefix}_parses_total counter")
+        out.append(f"{prefix}_parses_total{{{base}}} {self.parses}")
+
+        out.append(f"# HELP {prefix}_cache_hits_total Parses answered from the result cache.")
+        out.append(f"# TYPE {prefix}_cache_hits_total counter")
+        out.append(f"{prefix}_cache_hits_total{{{base}}} {self.cache_hits}")
+
+        out.append(f"# HELP {prefix}_errors_total Failed parses by error kind.")
+        out.append(f"# TYPE {prefix}_errors_total counter")
+        for kind, count in sorted(self.errors.items()):
+            out.append(f'{prefix}_errors_total{{{base},kind="{_label(kind)}"}} {count}')
+
+        out.append(f"# HELP {prefix}_unknown_option_total Unknown option hits by name.")
+        out.append(f"# TYPE {prefix}_unknown_option_total counter")
+        for name, count in sorted(self.unknown_options.items()):
+            out.append(f'{prefix}_unknown_option_total{{{base},option="{_label(name)}"}} {count}')
+
+        out.append(f"# HELP {prefix}_phase_seconds_total Time spent per parse phase.")
+        out.append(f"# TYPE {prefix}_phase_seconds_total counter")
+        for phase in PHASES:
+            out.append(f'{prefix}_phase_seconds_total{{{base},phase="{phase}"}} '
+                       f'{self.seconds[phase]:.9f}')
+        return "\n".join(out) + "\n"
+
+    def __repr__(self):
+        return f"Profiler(name={self.name}, enabled={self.enabled}, parses={self.parses})"
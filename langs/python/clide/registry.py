@@ -0,0 +1,117 @@
+"""Clyde multi-spec registry
+
+A `Registry` hosts the specs of many independent tools behind one dispatch
+index keyed by (prog, first literal), the same first literals Spec.index
+uses. Parsing `[prog, *args]` is two dict lookups to find the command, then
+a single parse, instead of trying one parser after another until one does
+not raise.
+
+Specs can be added, replaced and removed while other threads parse: only
+the entries of the tool that changes are touched, and each parse runs
+against one complete command, old or new.
+"""
+
+from __future__ import annotations
+
+import threading
+
+from .cache import compile_spec
+from .runtime import ArgError, ArgvView, CompiledCommand, ParseResult, parse_with
+from .spec import Spec
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+
+class Registry:
+    """Specs for many programs, dispatched on argv[0] and argv[1]
+
+    `typed` and `strict` apply to every command compiled by the registry
+    (see CompiledCommand).
+    """
+
+    def __init__(self, typed: bool = False, strict: bool = False):
+        self.typed = typed
+        self.strict = strict
+        self._specs: Dict[str, Spec] = {}
+        # (prog, first literal) -> command; (prog, None) -> default command
+        self._index: Dict[Tuple[str, Optional[str]], CompiledCommand] = {}
+        self._lock = threading.Lock()
+
+    def add(self, usage: Union[Sequence[str], Spec]) -> Spec:
+        """Register usage lines (or a Spec) under its prog, replacing any earlier one"""
+        spec = usage if isinstance(usage, Spec) else compile_spec(usage)
+        entries: Dict[Tuple[str, Optional[str]], CompiledCommand] = {}
+        compiled: Dict[int, CompiledCommand] = {}
+        for cmd in spec.commands:
+            compiled[id(cmd)] = CompiledCommand(cmd, typed=self.typed, strict=self.strict)
+        for literal, cmd in spec.index.items():
+            entries[(spec.prog, literal)] = compiled[id(cmd)]
+        if spec.default is not None:
+            entries[(spec.prog, None)] = compiled[id(spec.default)]
+
+        with self._lock:
+            old = self._specs.get(spec.prog)
+            self._index.update(entries)
+            if old is not None:
+                for literal in old.index:
+                    if literal not in spec.index:
+                        del self._index[(spec.prog, literal)]
+                if spec.default is None:
+                    self._index.pop((spec.prog, None), None)
+            self._specs[spec.prog] = spec
+        return spec
+
+    def remove(self, prog: str) -> bool:
+        """Unregister a program; returns whether it was registered"""
+        with self._lock:
+            spec = self._specs.pop(prog, None)
+            if spec is None:
+                return False
+            for literal in spec.index:
+                del self._index[(prog, literal)]
+            self._index.pop((prog, None), None)
+        return True
+
+    def get(self, prog: str) -> Optional[Spec]:
+        """The Spec registered for prog, if any"""
+        return self._specs.get(prog)
+
+    def lookup(self, argv: Sequence[str]) -> CompiledCommand:
+        """The command `[prog, *args]` dispatches to"""
+        if not argv:
+            raise ArgError("Missing program name")
+        prog = argv[0]
+        cmd = None
+        if len(argv) > 1:
+            cmd = self._index.get((prog, argv[1]))
+        if cmd is None:
+            cmd = self._index.get((prog, None))
+            if cmd is None:
+                raise ArgError(f"Unknown program: {prog}")
+        return cmd
+
+    def parse(self, argv: Sequence[str]) -> Tuple[str, ParseResult]:
+        """Parse `[prog, *args]`; returns the prog and the result for args"""
+        cmd = self.lookup(argv)
+        return argv[0], parse_with(cmd, ArgvView(argv, 1))
+
+    __call__ = parse
+
+    def parse_string(self, line: str) -> Tuple[str, ParseResult]:
+        """Split a shell-quoted line (see clide.shell) and parse it"""
+        from .shell import split
+        return self.parse(split(line))
+
+    def __contains__(self, prog: str) -> bool:
+        return prog in self._specs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._specs))
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def __repr__(self):
+        return f"Registry(programs={len(self._specs)})"
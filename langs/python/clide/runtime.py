@@ -1,125 +1,685 @@
 """Clyde runtime argument parser"""
 
-from typing import List, Tuple, Dict
-from .spec import Spec, Command, Item, Group, Atom, Lit, OptBool, OptVal, Pos, Type
+from __future__ import annotations
+
+from time import perf_counter
+from .spec import Spec, Command, Atom, Lit, OptBool, OptVal, Pos, Type
+from .profiling import Profiler, env_enabled
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from array import array
+    from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+    from .automaton import Automaton
+    from .cache import LRUCache
+    from .incremental import IncrementalParser
+    from .suggest import SuggestionIndex
 
 
 class ArgError(Exception):
-    """Error during argument parsing"""
-    def __init__(self, message: str):
+    """Error during argument parsing
+
+    For an unknown option or command, `suggestions` lists the nearest
+    declared names, closest first (see clide.suggest).
+    """
+    def __init__(self, message: str, suggestions: Sequence[str] = ()):
         self.message = message
+        self.suggestions = list(suggestions)
         super().__init__(self.message)
 
+    @property
+    def hint(self) -> str:
+        """"Did you mean ...?" for the suggestions, or an empty string"""
+        from .suggest import did_you_mean
+        return did_you_mean(self.suggestions)
+
+    def __reduce__(self):
+        return (type(self), (self.message, self.suggestions))
+
+
+_MISSING = object()
+
+
+class ArgvView:
+    """Read-only view of argv[start:stop] that shares the caller's sequence
+
+    Leftovers after `--` are returned as a view instead of a copy, so a
+    million trailing paths cost no extra memory. The view implements the
+    read-only sequence protocol and compares equal to lists and tuples with
+    the same items; its length is fixed when it is created. Call list() on
+    it before mutating the argv it came from.
+    """
+    __slots__ = ("_argv", "_start", "_stop")
+
+    def __init__(self, argv: Sequence[str], start: int = 0, stop: Optional[int] = None):
+        n = len(argv)
+        self._argv = argv
+        self._start = min(start, n)
+        self._stop = n if stop is None else max(self._start, min(stop, n))
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return ArgvView(self._argv, self._start + start, self._start + max(start, stop))
+            return [self._argv[self._start + k] for k in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ArgvView index out of range")
+        return self._argv[self._start + index]
+
+    def __iter__(self) -> Iterator[str]:
+        argv = self._argv
+        for k in range(self._start, self._stop):
+            yield argv[k]
+
+    def __reversed__(self) -> Iterator[str]:
+        argv = self._argv
+        for k in range(self._stop - 1, self._start - 1, -1):
+            yield argv[k]
+
+    def __contains__(self, value) -> bool:
+        return any(item == value for item in self)
+
+    def index(self, value, start: int = 0, stop: Optional[int] = None) -> int:
+        """Position of the first occurrence of value"""
+        for k in range(*slice(start, stop).indices(len(self))):
+            if self[k] == value:
+                return k
+        raise ValueError(f"{value!r} is not in ArgvView")
+
+    def count(self, value) -> int:
+        """Number of occurrences of value"""
+        return sum(1 for item in self if item == value)
+
+    def __eq__(self, other):
+        if not isinstance(other, (ArgvView, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (ArgvView, (list(self),))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+_NO_LEFTOVERS = ArgvView(())
+
 
 class ParseResult:
-    """Result of parsing command-line arguments"""
-    def __init__(self, command: str, options: List[Tuple[str, List[str]]],
-                 positionals: List[Tuple[str, str]], leftovers: List[str]):
+    """Result of parsing command-line arguments
+
+    Options and positionals are stored in insertion-ordered dicts, so the
+    accessors are constant time. The `options` and `positionals` list views
+    of the original API are built on first access.
+    """
+    __slots__ = ("command", "leftovers", "_opts", "_pos", "_options_view",
+                 "_positionals_view")
+
+    def __init__(self, command: str,
+                 options: Union[Dict[str, List[str]], List[Tuple[str, List[str]]]],
+                 positionals: Union[Dict[str, str], List[Tuple[str, str]]],
+                 leftovers: Sequence[str]):
         self.command = command
-        self.options = options
-        self.positionals = positionals
+        self._opts: Dict[str, List[str]] = options if isinstance(options, dict) else dict(options)
+        self._pos: Dict[str, str] = (positionals if isinstance(positionals, dict)
+                                     else dict(positionals))
         self.leftovers = leftovers
+        self._options_view: Optional[List[Tuple[str, List[str]]]] = None
+        self._positionals_view: Optional[List[Tuple[str, str]]] = None
+
+    @property
+    def options(self) -> List[Tuple[str, List[str]]]:
+        """Options as (name, [values]) pairs in the order they were recorded"""
+        if self._options_view is None:
+            self._options_view = list(self._opts.items())
+        return self._options_view
+
+    @property
+    def positionals(self) -> List[Tuple[str, str]]:
+        """Positionals as (name, value) pairs in the order they were recorded"""
+        if self._positionals_view is None:
+            self._positionals_view = list(self._pos.items())
+        return self._positionals_view
+
+    def get(self, key: str, default=None):
+        """Return the last value given for an option, or default"""
+        vals = self._opts.get(key)
+        return vals[-1] if vals else default
+
+    def get_all(self, key: str) -> List[str]:
+        """Return every value given for an option (empty if absent)"""
+        return self._opts.get(key, [])
+
+    def flag(self, key: str) -> bool:
+        """Return whether a boolean flag was set"""
+        vals = self._opts.get(key)
+        return bool(vals) and vals[-1] in (True, "true")
+
+    def positional(self, name: str, default=_MISSING):
+        """Return a positional value, raising KeyError if absent and no default"""
+        val = self._pos.get(name, default)
+        if val is _MISSING:
+            raise KeyError(name)
+        return val
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._opts or key in self._pos
 
     def __eq__(self, other):
         return (isinstance(other, ParseResult) and
                 self.command == other.command and
-                self.options == other.options and
-                self.positionals == other.positionals and
+                self._opts == other._opts and
+                self._pos == other._pos and
                 self.leftovers == other.leftovers)
 
+    def freeze(self) -> FrozenParseResult:
+        """An immutable copy that can be shared between callers"""
+        return FrozenParseResult(self.command, self._opts, self._pos, self.leftovers)
+
+    def __reduce__(self):
+        return (type(self), (self.command, self._opts, self._pos, self.leftovers))
+
     def __repr__(self):
-        return (f"ParseResult(command={self.command}, options={self.options}, "
+        return (f"{type(self).__name__}(command={self.command}, options={self.options}, "
                 f"positionals={self.positionals}, leftovers={self.leftovers})")
 
 
+def _frozen_opts(options: Dict[str, Sequence[object]]) -> Dict[str, Tuple[object, ...]]:
+    return {name: tuple(vals) for name, vals in options.items()}
+
+
+def _frozen_pos(positionals: Dict[str, object]) -> Dict[str, object]:
+    # Only a variadic positional holds a list
+    return {name: tuple(val) if isinstance(val, list) else val
+            for name, val in positionals.items()}
+
+
+class FrozenParseResult(ParseResult):
+    """A ParseResult that cannot be changed
+
+    Option values, variadic positionals, leftovers and the `options` and
+    `positionals` views are tuples, and attributes cannot be reassigned.
+    It compares equal to the ParseResult it was made from.
+    """
+    __slots__ = ()
+
+    def __init__(self, command: str,
+                 options: Union[Dict[str, Sequence[object]], List[Tuple[str, Sequence[object]]]],
+                 positionals: Union[Dict[str, object], List[Tuple[str, object]]],
+                 leftovers: Sequence[str]):
+        opts = _frozen_opts(dict(options))
+        pos = _frozen_pos(dict(positionals))
+        init = object.__setattr__
+        init(self, "command", command)
+        init(self, "_opts", opts)
+        init(self, "_pos", pos)
+        init(self, "leftovers", tuple(leftovers))
+        init(self, "_options_view", tuple(opts.items()))
+        init(self, "_positionals_view", tuple(pos.items()))
+
+    def freeze(self) -> FrozenParseResult:
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"FrozenParseResult is immutable: cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"FrozenParseResult is immutable: cannot delete {name}")
+
+    def __eq__(self, other):
+        return (isinstance(other, ParseResult) and
+                self.command == other.command and
+                self._opts == _frozen_opts(other._opts) and
+                self._pos == _frozen_pos(other._pos) and
+                self.leftovers == tuple(other.leftovers))
+
+
 def choose_command(spec: Spec, argv: List[str]) -> Command:
     """Choose which command to use based on argv"""
     if not argv:
-        return spec.commands[0]
-
-    first_arg = argv[0]
+        return spec.default
 
-    for cmd in spec.commands:
-        lit = first_literal(cmd)
-        if lit == first_arg:
-            return cmd
+    return spec.lookup(argv[0])
 
-    return spec.commands[0]
 
-
-def first_literal(cmd: Command) -> str:
+def first_literal(cmd: Command) -> Optional[str]:
     """Get the first literal atom from a command"""
-    for item in cmd.items:
-        if item.required:
-            atoms = item.group.atoms_list()
-            if len(atoms) == 1 and isinstance(atoms[0], Lit):
-                return atoms[0].value
-            elif len(atoms) > 1:
-                for atom in atoms:
+    return cmd.literal
+
+
+class CompiledCommand:
+    """A Command with its lookup tables precomputed for repeated parsing
+
+    With `typed=True` values are converted by `convert_val` (int, bool,
+    pathlib.Path, str) instead of being returned as validated strings.
+    With `stream=True` a variadic positional comes back as a generator that
+    validates values as it is consumed, instead of a list.
+
+    Repeatable options (`=TYPE+`) can be bounded: `max_repeats` caps their
+    occurrences, and `on_repeat(name, value)` receives each value instead
+    of the result, which then keeps only the last one.
+
+    With `strict=True` argv is matched against the usage structure by an
+    `Automaton` (see clide.automaton): literals in order, `[a|b]` members
+    exclusive, options outside brackets required.
+    """
+    def __init__(self, cmd: Command, typed: bool = False, stream: bool = False,
+                 max_repeats: Optional[int] = None,
+                 on_repeat: Optional[Callable[[str, object], None]] = None,
+                 strict: bool = False):
+        if strict and stream:
+            raise ValueError("strict cannot be combined with stream")
+        self.command = cmd
+        self.name = cmd.name
+        self.typed = typed
+        self.stream = stream
+        self.max_repeats = max_repeats
+        self.on_repeat = on_repeat
+        self.convert: Callable[[Type, str], object] = convert_val if typed else parse_val
+        self.true_val: object = True if typed else "true"
+        self.false_val: object = False if typed else "false"
+
+        atoms: List[Atom] = []
+        for item in cmd.items:
+            atoms.extend(item.group.atoms_list())
+        self.atoms = atoms
+
+        # Required literals are consumed wherever they appear in argv
+        self.literals: Set[str] = set()
+        for item in cmd.items:
+            if item.required:
+                for atom in item.group.atoms_list():
                     if isinstance(atom, Lit):
-                        return atom.value
-    return None
-
-
-def parse_with(cmd: Command, argv: List[str]) -> ParseResult:
-    """Parse arguments according to a command specification"""
-    seq: List[Tuple[bool, Group]] = []
-    for item in cmd.items:
-        seq.append((not item.required, item.group))
-
-    atoms: List[Atom] = []
-    for _, group in seq:
-        atoms.extend(group.atoms_list())
-
-    # Build list of known options
-    known_opts: List[str] = []
-    for atom in atoms:
-        if isinstance(atom, OptBool):
-            if atom.long:
-                known_opts.append(atom.long)
-            if atom.short:
-                known_opts.append(atom.short)
-        elif isinstance(atom, OptVal):
-            if atom.long:
-                known_opts.append(atom.long)
-            if atom.short:
-                known_opts.append(atom.short)
-
-    # Build list of positionals
-    pos_list: List[Tuple[str, Type, str]] = []
-    for atom in atoms:
-        if isinstance(atom, Pos):
-            pos_list.append((atom.name, atom.ty, atom.default))
-
-    opts_map: List[Tuple[str, List[str]]] = []
-    pos_map: List[Tuple[str, str]] = []
+                        self.literals.add(atom.value)
+
+        # Option name -> declaration; the first declaration of a name wins
+        self.options: Dict[str, Atom] = {}
+        for atom in atoms:
+            if isinstance(atom, (OptBool, OptVal)):
+                if atom.long:
+                    self.options.setdefault(atom.long, atom)
+                if atom.short:
+                    self.options.setdefault(atom.short, atom)
+
+        # Repeatable options; typed INT ones are stored as array('q'), and
+        # all of them take the slow append path when bounded
+        self.repeatable: Set[str] = set()
+        self.compact: Set[str] = set()
+        for name, decl in self.options.items():
+            if isinstance(decl, OptVal) and decl.allow_repeat:
+                self.repeatable.add(name)
+                if typed and decl.ty == Type.INT:
+                    self.compact.add(name)
+        self.bounded = max_repeats is not None or on_repeat is not None
+        self.special: Set[str] = self.repeatable if self.bounded else self.compact
+
+        # Positional table: (name, type, validated default)
+        self.positionals: List[Tuple[str, Type, object]] = []
+        for atom in atoms:
+            if isinstance(atom, Pos):
+                self.positionals.append(
+                    (atom.name, atom.ty, _checked_default(self.convert, atom.ty, atom.default)))
+
+        # Slot of the variadic positional (always the last one); outside
+        # brackets it needs at least one value unless it has a default
+        self.variadic: Optional[int] = None
+        self.variadic_required = False
+        for item in cmd.items:
+            for atom in item.group.atoms_list():
+                if isinstance(atom, Pos) and atom.variadic:
+                    self.variadic = len(self.positionals) - 1
+                    self.variadic_required = item.required
+
+        # Option defaults in declaration order: (key, validated default)
+        self.defaults: List[Tuple[str, object]] = []
+        for atom in atoms:
+            key = atom.long or atom.short if isinstance(atom, (OptBool, OptVal)) else None
+            if not key:
+                continue
+            if isinstance(atom, OptBool):
+                self.defaults.append((key, self.false_val))
+            else:
+                self.defaults.append(
+                    (key, _checked_default(self.convert, atom.ty, atom.default)))
+
+        self.automaton: Optional[Automaton] = None
+        if strict:
+            from .automaton import Automaton
+            self.automaton = Automaton(self)
+        # Built on the first unknown option
+        self._option_index: Optional[SuggestionIndex] = None
+
+    def suggest_option(self, name: str) -> List[str]:
+        """Declared option names close to an unknown one"""
+        if self._option_index is None:
+            from .suggest import SuggestionIndex
+            self._option_index = SuggestionIndex(self.options)
+        return self._option_index.suggest(name)
+
+    def unknown_option(self, name: str) -> ArgError:
+        """The error for an undeclared option, with suggestions"""
+        return ArgError(f"Unknown option: {name}", self.suggest_option(name))
+
+    def __repr__(self):
+        return f"CompiledCommand(name={self.name})"
+
+
+class _BadDefault:
+    """A declared default that failed validation, reported only when used"""
+    def __init__(self, message: str):
+        self.message = message
+
+
+def _checked_default(convert: Callable[[Type, str], object], ty: Type,
+                     default: Optional[str]) -> object:
+    """Convert a declared default once, deferring any error to parse time"""
+    if default is None:
+        return None
+    try:
+        return convert(ty, default)
+    except ArgError as e:
+        return _BadDefault(e.message)
+
+
+def _use_default(val: object) -> str:
+    """Return a validated default, raising its deferred error if invalid"""
+    if isinstance(val, _BadDefault):
+        raise ArgError(val.message)
+    return val
+
+
+def compile_command(cmd: Command, typed: bool = False, stream: bool = False,
+                    max_repeats: Optional[int] = None,
+                    on_repeat: Optional[Callable[[str, object], None]] = None,
+                    strict: bool = False) -> CompiledCommand:
+    """Precompute the lookup tables used by parse_with for a command"""
+    return CompiledCommand(cmd, typed=typed, stream=stream, max_repeats=max_repeats,
+                           on_repeat=on_repeat, strict=strict)
+
+
+class CompiledSpec:
+    """A Spec with every command compiled; calling it parses an argv
+
+    `profiler` records phase timings and counters once enabled (see
+    `clide.profiling`); while disabled it costs one attribute check.
+
+    With `cache_size=N`, the last N distinct argvs that parsed successfully
+    are remembered and answered with a shared FrozenParseResult, without
+    touching the token loop. Results are deterministic for a fixed spec,
+    so the cache is only refused where a parse has effects or is consumed:
+    `stream` and `on_repeat`. An argv that names an argument file is never
+    cached, since the file can change.
+    """
+    def __init__(self, spec: Spec, typed: bool = False, stream: bool = False,
+                 max_repeats: Optional[int] = None,
+                 on_repeat: Optional[Callable[[str, object], None]] = None,
+                 argfiles: bool = False, cache_size: int = 0, strict: bool = False):
+        start = perf_counter()
+        self.spec = spec
+        self.typed = typed
+        self.stream = stream
+        self.strict = strict
+        self.max_repeats = max_repeats
+        self.on_repeat = on_repeat
+        self.argfiles = argfiles
+        self.cache_size = cache_size
+        self._expand: Optional[Callable[[Sequence[str]], Sequence[str]]] = None
+        if argfiles:
+            from .argfiles import expand_argv
+            self._expand = expand_argv
+        self.results: Optional[LRUCache] = None
+        if cache_size:
+            if stream or on_repeat is not None:
+                raise ValueError("cache_size cannot be combined with stream or on_repeat")
+            from .cache import LRUCache
+            self.results = LRUCache(cache_size)
+        self.commands: Dict[int, CompiledCommand] = {
+            id(cmd): compile_command(cmd, typed=typed, stream=stream, max_repeats=max_repeats,
+                                     on_repeat=on_repeat, strict=strict)
+            for cmd in spec.commands
+        }
+        self.profiler = Profiler(spec.prog, enabled=env_enabled())
+        self.profiler.seconds["compile"] += perf_counter() - start
+        self._profiled: Dict[int, CompiledCommand] = {}
+        # Built on the first failed parse of an unknown command word
+        self._command_index: Optional[SuggestionIndex] = None
+
+    def parse(self, argv: List[str]) -> ParseResult:
+        """Choose a command for argv and parse it
+
+        With `argfiles=True`, @file and --args-from arguments are expanded
+        first (see clide.argfiles). When argv[0] is no command literal and
+        the parse fails, the ArgError suggests the nearest literals.
+        """
+        try:
+            if self.results is not None:
+                return self._parse_cached(argv)
+            if self._expand is not None:
+                return self._parse_expanded(argv)
+            if self.profiler.enabled:
+                return self._parse_profiled(argv)
+            cmd = choose_command(self.spec, argv)
+            return parse_with(self.commands[id(cmd)], argv)
+        except ArgError as e:
+            if not e.suggestions and argv:
+                word = argv[0]
+                if not word.startswith("-") and word not in self.spec.index:
+                    e.suggestions = self.suggest_command(word)
+            raise
+
+    __call__ = parse
+
+    def parse_string(self, line: str) -> ParseResult:
+        """Split a shell-quoted command line (see clide.shell) and parse it"""
+        from .shell import split
+        return self.parse(split(line))
+
+    def suggest_command(self, word: str) -> List[str]:
+        """Command literals close to word"""
+        if self._command_index is None:
+            from .suggest import SuggestionIndex
+            self._command_index = SuggestionIndex(self.spec.index)
+        return self._command_index.suggest(word)
+
+    def _parse_cached(self, argv: Sequence[str]) -> FrozenParseResult:
+        key = tuple(argv)
+        result = self.results.get(key)
+        if result is not None:
+            profiler = self.profiler
+            if profiler.enabled:
+                profiler.parses += 1
+                profiler.cache_hits += 1
+            return result
+        expanded = argv if self._expand is None else self._expand(argv)
+        try:
+            result = self._parse_one(expanded).freeze()
+        finally:
+            if expanded is not argv:
+                expanded.close()
+        if expanded is argv:
+            self.results.put(key, result)
+        return result
+
+    def _parse_expanded(self, argv: Sequence[str]) -> ParseResult:
+        """Parse with argument files spliced in, then release their mappings"""
+        expanded = self._expand(argv)
+        if expanded is argv:
+            return self._parse_one(argv)
+        try:
+            result = self._parse_one(expanded)
+        except BaseException:
+            expanded.close()
+            raise
+        # Leftovers and a streamed variadic still read the files lazily
+        if not result.leftovers and not self.stream:
+            expanded.close()
+        return result
+
+    def _parse_one(self, argv: Sequence[str]) -> ParseResult:
+        if self.profiler.enabled:
+            return self._parse_profiled(argv)
+        cmd = choose_command(self.spec, argv)
+        return parse_with(self.commands[id(cmd)], argv)
+
+    def cache_info(self) -> Dict[str, int]:
+        """Result cache hits, misses, maxsize and currsize (all 0 without a cache)"""
+        if self.results is None:
+            return {"hits": 0, "misses": 0, "maxsize": 0, "currsize": 0}
+        return self.results.cache_info()
+
+    def cache_clear(self):
+        """Drop every cached result and reset the counters"""
+        if self.results is not None:
+            self.results.clear()
+
+    def cache_evict(self, argv: Sequence[str]) -> bool:
+        """Forget the result for one argv; returns whether it was cached"""
+        return self.results is not None and self.results.discard(tuple(argv))
+
+    def incremental(self) -> IncrementalParser:
+        """A push-style parser fed one token at a time (see clide.incremental)"""
+        from .incremental import IncrementalParser
+        return IncrementalParser(self)
+
+    def stats(self) -> Dict[str, object]:
+        """Profiler counters as a dict"""
+        return self.profiler.as_dict()
+
+    def _profiled_command(self, cmd: Command) -> CompiledCommand:
+        """A copy of the compiled command whose conversions are timed"""
+        compiled = self._profiled.get(id(cmd))
+        if compiled is None:
+            import copy
+            compiled = copy.copy(self.commands[id(cmd)])
+            profiler = self.profiler
+            convert = compiled.convert
+
+            def timed_convert(ty: Type, s: str) -> object:
+                start = perf_counter()
+                try:
+                    return convert(ty, s)
+                finally:
+                    profiler.seconds["convert"] += perf_counter() - start
+
+            compiled.convert = timed_convert
+            if compiled.automaton is not None:
+                from .automaton import Automaton
+                compiled.automaton = Automaton(compiled)
+            self._profiled[id(cmd)] = compiled
+        return compiled
+
+    def _parse_profiled(self, argv: List[str]) -> ParseResult:
+        profiler = self.profiler
+        seconds = profiler.seconds
+        try:
+            t0 = perf_counter()
+            cmd = choose_command(self.spec, argv)
+            t1 = perf_counter()
+            seconds["choose_command"] += t1 - t0
+
+            compiled = self._profiled_command(cmd)
+            converting = seconds["convert"]
+            try:
+                if compiled.automaton is None:
+                    opts_map, pos_map, leftovers = _scan(compiled, argv)
+                else:
+                    opts_map, pos_map, leftovers = compiled.automaton.scan(argv)
+            finally:
+                t2 = perf_counter()
+                seconds["tokens"] += (t2 - t1) - (seconds["convert"] - converting)
+
+            try:
+                _fill_defaults(compiled, opts_map, pos_map)
+            finally:
+                seconds["defaults"] += perf_counter() - t2
+        except Exception as e:
+            profiler.record_error(e)
+            raise
+        profiler.parses += 1
+        return ParseResult(compiled.name, opts_map, pos_map, leftovers)
+
+    def __repr__(self):
+        return f"CompiledSpec(prog={self.spec.prog})"
+
+
+def parse_with(cmd: Union[Command, CompiledCommand], argv: List[str],
+               typed: bool = False, stream: bool = False) -> ParseResult:
+    """Parse arguments according to a command specification
+
+    `typed` and `stream` apply only when a plain Command is given; a
+    CompiledCommand carries its own mode.
+    """
+    if not isinstance(cmd, CompiledCommand):
+        cmd = compile_command(cmd, typed=typed, stream=stream)
+
+    if cmd.automaton is None:
+        opts_map, pos_map, leftovers = _scan(cmd, argv)
+    else:
+        opts_map, pos_map, leftovers = cmd.automaton.scan(argv)
+    _fill_defaults(cmd, opts_map, pos_map)
+    return ParseResult(
+        command=cmd.name,
+        options=opts_map,
+        positionals=pos_map,
+        leftovers=leftovers
+    )
+
+
+def _scan(cmd: CompiledCommand, argv: List[str]
+          ) -> Tuple[Dict[str, List[str]], Dict[str, str], ArgvView]:
+    """Run the token loop, returning options, positionals and leftovers
+
+    argv is iterated in place, never copied, so lazily decoded sequences
+    (see clide.argfiles) stream through; leftovers are a view over it.
+    """
+    options = cmd.options
+    literals = cmd.literals
+    pos_list = cmd.positionals
+    convert = cmd.convert
+    variadic = cmd.variadic
+    special = cmd.special
+
+    opts_map: Dict[str, List[str]] = {}
+    pos_map: Dict[str, str] = {}
     seen_pos = 0
-    leftovers: List[str] = []
+    leftovers = _NO_LEFTOVERS
 
-    args = argv[:]
-    i = 0
+    it = iter(argv)
+    i = -1
 
-    while i < len(args):
-        arg = args[i]
+    for arg in it:
+        i += 1
 
         if arg == "--":
             # Handle remaining positionals
             remaining_pos = pos_list[seen_pos:]
-            rest = args[i + 1:]
+            rest = i + 1
+            base = seen_pos
 
             for j, (name, ty, default) in enumerate(remaining_pos):
-                if j < len(rest):
-                    val = parse_val(ty, rest[j])
-                    pos_map.append((name, val))
+                if base + j == variadic:
+                    # The variadic positional takes everything that is left
+                    _take_variadic(cmd, pos_map, it, name, ty, default)
+                    break
+                val = next(it, _MISSING)
+                if val is not _MISSING:
+                    pos_map[name] = convert(ty, val)
                     seen_pos += 1
                 elif default is not None:
-                    val = parse_val(ty, default)
-                    pos_map.append((name, val))
+                    pos_map[name] = _use_default(default)
                     seen_pos += 1
                 else:
                     raise ArgError(f"Missing positional: {name}")
-
-            leftovers = rest[len(remaining_pos):]
+            else:
+                leftovers = ArgvView(argv, rest + len(remaining_pos))
             break
         elif arg.startswith('-'):
             if '=' in arg:
@@ -130,55 +690,36 @@ def parse_with(cmd: Command, argv: List[str]) -> ParseResult:
                 name_part = arg
                 val_part = None
 
-            if name_part not in known_opts:
-                raise ArgError(f"Unknown option: {name_part}")
-
-            # Find the option declaration
-            opt_decl = None
-            for atom in atoms:
-                if isinstance(atom, OptVal):
-                    if atom.long == name_part or atom.short == name_part:
-                        opt_decl = atom
-                        break
-                elif isinstance(atom, OptBool):
-                    if atom.long == name_part or atom.short == name_part:
-                        opt_decl = atom
-                        break
-
+            opt_decl = options.get(name_part)
             if opt_decl is None:
-                raise ArgError("Unknown option declaration")
+                raise cmd.unknown_option(name_part)
 
             if isinstance(opt_decl, OptBool):
-                add_opt(opts_map, name_part, "true")
-                i += 1
-            elif isinstance(opt_decl, OptVal):
+                vals = opts_map.get(name_part)
+                if vals is None:
+                    opts_map[name_part] = [cmd.true_val]
+                else:
+                    vals.append(cmd.true_val)
+            else:
                 if val_part is not None:
-                    val = parse_val(opt_decl.ty, val_part)
+                    val = convert(opt_decl.ty, val_part)
                 else:
-                    if i + 1 < len(args):
-                        i += 1
-                        val = parse_val(opt_decl.ty, args[i])
-                    else:
+                    val = next(it, _MISSING)
+                    if val is _MISSING:
                         raise ArgError(f"Missing value for {name_part}")
-                add_opt(opts_map, name_part, val)
-                i += 1
+                    i += 1
+                    val = convert(opt_decl.ty, val)
+                if name_part in special:
+                    _add_repeat(cmd, opts_map, name_part, val)
+                else:
+                    vals = opts_map.get(name_part)
+                    if vals is None:
+                        opts_map[name_part] = [val]
+                    else:
+                        vals.append(val)
         else:
-            # Try to consume as literal
-            consumed = False
-            for req, group in seq:
-                if not req:  # optional
-                    atoms_list = group.atoms_list()
-                    if len(atoms_list) == 1 and isinstance(atoms_list[0], Lit):
-                        if atoms_list[0].value == arg:
-                            consumed = True
-                            break
-                    elif len(atoms_list) > 1:
-                        if any(isinstance(a, Lit) and a.value == arg for a in atoms_list):
-                            consumed = True
-                            break
-
-            if consumed:
-                i += 1
+            # Try to consume as a required literal
+            if arg in literals:
                 continue
 
             # Treat as positional
@@ -186,40 +727,146 @@ def parse_with(cmd: Command, argv: List[str]) -> ParseResult:
                 raise ArgError(f"Unexpected argument: {arg}")
 
             name, ty, _ = pos_list[seen_pos]
-            val = parse_val(ty, arg)
-            pos_map.append((name, val))
+            if seen_pos == variadic:
+                if cmd.stream:
+                    # Stop scanning; the generator validates the tail lazily
+                    pos_map[name] = _stream_variadic(cmd, it, arg, ty, False)
+                    break
+                vals = pos_map.get(name)
+                if vals is None:
+                    pos_map[name] = [convert(ty, arg)]
+                else:
+                    vals.append(convert(ty, arg))
+                continue
+
+            pos_map[name] = convert(ty, arg)
             seen_pos += 1
-            i += 1
 
+    return opts_map, pos_map, leftovers
+
+
+_array = None
+
+
+class _Streamed(list):
+    """The last value of a repeatable option whose values went to on_repeat"""
+    __slots__ = ("total",)
+
+
+def compact_values(values: List[int]) -> Union[array, List[int]]:
+    """INT values as array('q'), or a list when one does not fit in 64 bits"""
+    global _array
+    if _array is None:
+        # array pulls in collections.abc; load it only when first needed
+        from array import array as _array
+    try:
+        return _array('q', values)
+    except OverflowError:
+        return list(values)
+
+
+def _add_repeat(cmd: CompiledCommand, opts_map: Dict[str, object], name: str, val: object):
+    """Record a repeatable option value under a cap, callback or compact storage"""
+    vals = opts_map.get(name)
+    if not cmd.bounded:
+        if vals is None:
+            opts_map[name] = compact_values([val])
+        else:
+            try:
+                vals.append(val)
+            except OverflowError:
+                opts_map[name] = list(vals) + [val]
+        return
+
+    count = 0 if vals is None else getattr(vals, "total", len(vals))
+    cap = cmd.max_repeats
+    if cap is not None and count >= cap and name in cmd.repeatable:
+        raise ArgError(f"Too many values for {name} (limit {cap})")
+
+    if cmd.on_repeat is not None and name in cmd.repeatable:
+        cmd.on_repeat(name, val)
+        if vals is None:
+            vals = opts_map[name] = _Streamed([val])
+            vals.total = 1
+        else:
+            vals[-1] = val
+            vals.total += 1
+    elif vals is None:
+        opts_map[name] = compact_values([val]) if name in cmd.compact else [val]
+    else:
+        try:
+            vals.append(val)
+        except OverflowError:
+            opts_map[name] = list(vals) + [val]
+
+
+def _variadic_empty(cmd: CompiledCommand, name: str, default: object) -> List[object]:
+    """Values of a variadic positional that was given nothing"""
+    if default is not None:
+        return [_use_default(default)]
+    if cmd.variadic_required:
+        raise ArgError(f"Missing positional: {name}")
+    return []
+
+
+def _take_variadic(cmd: CompiledCommand, pos_map: Dict[str, object], it: Iterator[str],
+                   name: str, ty: Type, default: object):
+    """Give the variadic positional everything left in `it`, after `--`"""
+    if cmd.stream:
+        first = next(it, _MISSING)
+        if first is not _MISSING:
+            pos_map[name] = _stream_variadic(cmd, it, first, ty, True)
+        else:
+            pos_map[name] = iter(_variadic_empty(cmd, name, default))
+        return
+    convert = cmd.convert
+    vals = pos_map.get(name) or []
+    vals.extend([convert(ty, arg) for arg in it])
+    pos_map[name] = vals or _variadic_empty(cmd, name, default)
+
+
+def _stream_variadic(cmd: CompiledCommand, it: Iterator[str], first: str, ty: Type,
+                     raw: bool) -> Iterator[object]:
+    """Validate and yield `first` and the rest of `it` as they are consumed
+
+    Until a `--` (or from the start when `raw`), required literals are
+    skipped as in the eager scan and an option raises ArgError, since the
+    options of the result were already collected.
+    """
+    convert = cmd.convert
+    literals = cmd.literals
+    yield convert(ty, first)
+    for arg in it:
+        if not raw:
+            if arg == "--":
+                raw = True
+                continue
+            if arg.startswith('-'):
+                raise ArgError(f"Option after streamed positional: {arg}")
+            if arg in literals:
+                continue
+        yield convert(ty, arg)
+
+
+def _fill_defaults(cmd: CompiledCommand, opts_map: Dict[str, List[str]],
+                   pos_map: Dict[str, str]):
+    """Add option and positional defaults for anything not given"""
     # Add option defaults
-    for atom in atoms:
-        if isinstance(atom, OptVal):
-            key = atom.long or atom.short
-            if key and not any(k == key for k, _ in opts_map):
-                if atom.default is not None:
-                    val = parse_val(atom.ty, atom.default)
-                    opts_map.append((key, [val]))
-        elif isinstance(atom, OptBool):
-            key = atom.long or atom.short
-            if key and not any(k == key for k, _ in opts_map):
-                opts_map.append((key, ["false"]))
+    for key, default in cmd.defaults:
+        if default is not None and key not in opts_map:
+            opts_map[key] = [_use_default(default)]
 
     # Add positional defaults
-    for name, ty, default in pos_list:
-        if not any(k == name for k, _ in pos_map):
-            if default is not None:
-                val = parse_val(ty, default)
-                pos_map.append((name, val))
+    for slot, (name, ty, default) in enumerate(cmd.positionals):
+        if name not in pos_map:
+            if slot == cmd.variadic:
+                vals = _variadic_empty(cmd, name, default)
+                pos_map[name] = iter(vals) if cmd.stream else vals
+            elif default is not None:
+                pos_map[name] = _use_default(default)
             else:
                 raise ArgError(f"Missing positional: {name}")
 
-    return ParseResult(
-        command=cmd.name,
-        options=opts_map,
-        positionals=pos_map,
-        leftovers=leftovers
-    )
-
 
 def parse_val(ty: Type, s: str) -> str:
     """Parse a string value according to type"""
@@ -241,8 +888,46 @@ def parse_val(ty: Type, s: str) -> str:
         raise ArgError(f"Unknown type: {ty}")
 
 
-def add_opt(opts_map: List[Tuple[str, List[str]]], key: str, val: str):
+_Path = None
+
+
+def convert_val(ty: Type, s: str) -> object:
+    """Validate a string value and convert it to its Python type
+
+    INT -> int, BOOL -> bool, PATH -> pathlib.Path, STR -> str. pathlib is
+    imported on the first PATH conversion only.
+    """
+    global _Path
+    if ty == Type.INT:
+        try:
+            return int(s)
+        except ValueError:
+            raise ArgError(f"Expected INT, got: {s}")
+    elif ty == Type.BOOL:
+        lower = s.lower()
+        if lower == "true":
+            return True
+        elif lower == "false":
+            return False
+        else:
+            raise ArgError(f"Expected BOOL (true|false), got: {s}")
+    elif ty == Type.PATH:
+        if _Path is None:
+            from pathlib import Path
+            _Path = Path
+        return _Path(s)
+    elif ty == Type.STR:
+        return s
+    else:
+        raise ArgError(f"Unknown type: {ty}")
+
+
+def add_opt(opts_map: Union[Dict[str, List[str]], List[Tuple[str, List[str]]]],
+            key: str, val: str):
     """Add an option value to the options map"""
+    if isinstance(opts_map, dict):
+        opts_map.setdefault(key, []).append(val)
+        return
     for i, (k, vals) in enumerate(opts_map):
         if k == key:
             vals.append(val)
@@ -1,7 +1,19 @@
-"""Clyde specification data structures"""
+"""Clyde specification data structures
 
+Spec objects are immutable, slotted and hashable: they can be shared
+between threads, used as dict keys and memoization keys, and option names
+and literals are interned so that many resident specs share their strings.
+"""
+
+from __future__ import annotations
+
+import sys
 from enum import Enum
-from typing import Optional, List, Union
+from types import MappingProxyType
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Iterable, Optional, Tuple, Union
 
 
 class Type(Enum):
@@ -29,18 +41,58 @@ class Type(Enum):
         return self.value
 
 
-class Atom:
+def _intern(s: Optional[str]) -> Optional[str]:
+    return sys.intern(s) if type(s) is str else s
+
+
+class _Frozen:
+    """Immutable, hashable base: equality and hashing follow `_fields`"""
+    __slots__ = ("_hash",)
+    _fields: Tuple[str, ...] = ()
+
+    def _init(self, **values: Any):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def _key(self) -> tuple:
+        return tuple(getattr(self, f) for f in self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            h = hash((type(self).__name__,) + self._key())
+            object.__setattr__(self, "_hash", h)
+            return h
+
+    def __reduce__(self):
+        return (type(self), self._key())
+
+
+class Atom(_Frozen):
     """Represents an atomic element in a usage specification"""
-    pass
+    __slots__ = ()
 
 
 class Lit(Atom):
     """Literal string atom"""
-    def __init__(self, value: str):
-        self.value = value
+    __slots__ = ("value",)
+    _fields = ("value",)
 
-    def __eq__(self, other):
-        return isinstance(other, Lit) and self.value == other.value
+    def __init__(self, value: str):
+        self._init(value=_intern(value))
 
     def __repr__(self):
         return f"Lit('{self.value}')"
@@ -48,13 +100,11 @@ class Lit(Atom):
 
 class OptBool(Atom):
     """Boolean option atom (flag)"""
-    def __init__(self, long: Optional[str] = None, short: Optional[str] = None):
-        self.long = long
-        self.short = short
+    __slots__ = ("long", "short")
+    _fields = ("long", "short")
 
-    def __eq__(self, other):
-        return (isinstance(other, OptBool) and
-                self.long == other.long and self.short == other.short)
+    def __init__(self, long: Optional[str] = None, short: Optional[str] = None):
+        self._init(long=_intern(long), short=_intern(short))
 
     def __repr__(self):
         return f"OptBool(long={self.long}, short={self.short})"
@@ -62,20 +112,14 @@ class OptBool(Atom):
 
 class OptVal(Atom):
     """Value option atom"""
+    __slots__ = ("long", "short", "ty", "default", "allow_repeat")
+    _fields = ("long", "short", "ty", "default", "allow_repeat")
+
     def __init__(self, long: Optional[str] = None, short: Optional[str] = None,
                  ty: Type = Type.STR, default: Optional[str] = None,
                  allow_repeat: bool = False):
-        self.long = long
-        self.short = short
-        self.ty = ty
-        self.default = default
-        self.allow_repeat = allow_repeat
-
-    def __eq__(self, other):
-        return (isinstance(other, OptVal) and
-                self.long == other.long and self.short == other.short and
-                self.ty == other.ty and self.default == other.default and
-                self.allow_repeat == other.allow_repeat)
+        self._init(long=_intern(long), short=_intern(short), ty=ty, default=default,
+                   allow_repeat=allow_repeat)
 
     def __repr__(self):
         return (f"OptVal(long={self.long}, short={self.short}, ty={self.ty}, "
@@ -83,84 +127,112 @@ class OptVal(Atom):
 
 
 class Pos(Atom):
-    """Positional argument atom"""
-    def __init__(self, name: str, ty: Type, default: Optional[str] = None):
-        self.name = name
-        self.ty = ty
-        self.default = default
+    """Positional argument atom; a variadic one (`<name:TYPE>...`) takes many values"""
+    __slots__ = ("name", "ty", "default", "variadic")
+    _fields = ("name", "ty", "default", "variadic")
 
-    def __eq__(self, other):
-        return (isinstance(other, Pos) and
-                self.name == other.name and self.ty == other.ty and
-                self.default == other.default)
+    def __init__(self, name: str, ty: Type, default: Optional[str] = None,
+                 variadic: bool = False):
+        self._init(name=_intern(name), ty=ty, default=default, variadic=variadic)
 
     def __repr__(self):
-        return f"Pos(name={self.name}, ty={self.ty}, default={self.default})"
+        return (f"Pos(name={self.name}, ty={self.ty}, default={self.default}, "
+                f"variadic={self.variadic})")
 
 
-class Group:
+class Group(_Frozen):
     """Represents a group of atoms (single or alternative)"""
-    def __init__(self, atoms: Union[Atom, List[Atom]]):
+    __slots__ = ("atoms", "is_alt")
+    _fields = ("atoms",)
+
+    def __init__(self, atoms: Union[Atom, Iterable[Atom]]):
         if isinstance(atoms, Atom):
-            self.atoms = [atoms]
-            self.is_alt = False
+            self._init(atoms=(atoms,), is_alt=False)
         else:
-            self.atoms = atoms
-            self.is_alt = len(atoms) > 1
+            atoms = tuple(atoms)
+            self._init(atoms=atoms, is_alt=len(atoms) > 1)
 
-    def atoms_list(self) -> List[Atom]:
-        """Get list of atoms in this group"""
+    def atoms_list(self) -> Tuple[Atom, ...]:
+        """Get the atoms in this group"""
         return self.atoms
 
-    def __eq__(self, other):
-        return (isinstance(other, Group) and
-                self.atoms == other.atoms and self.is_alt == other.is_alt)
-
     def __repr__(self):
         if self.is_alt:
-            return f"Group.Alt({self.atoms})"
+            return f"Group.Alt({list(self.atoms)})"
         else:
             return f"Group.Single({self.atoms[0]})"
 
 
-class Item:
+class Item(_Frozen):
     """Represents a required or optional item"""
-    def __init__(self, group: Group, required: bool = True):
-        self.group = group
-        self.required = required
+    __slots__ = ("group", "required")
+    _fields = ("group", "required")
 
-    def __eq__(self, other):
-        return (isinstance(other, Item) and
-                self.group == other.group and self.required == other.required)
+    def __init__(self, group: Group, required: bool = True):
+        self._init(group=group, required=required)
 
     def __repr__(self):
         prefix = "Required" if self.required else "Optional"
         return f"{prefix}({self.group})"
 
 
-class Command:
-    """Represents a command specification"""
-    def __init__(self, name: str, items: List[Item]):
-        self.name = name
-        self.items = items
+def first_literal_of(items: Iterable[Item]) -> Optional[str]:
+    """Find the first literal atom among the required items"""
+    for item in items:
+        if item.required:
+            atoms = item.group.atoms_list()
+            if len(atoms) == 1 and isinstance(atoms[0], Lit):
+                return atoms[0].value
+            elif len(atoms) > 1:
+                for atom in atoms:
+                    if isinstance(atom, Lit):
+                        return atom.value
+    return None
 
-    def __eq__(self, other):
-        return (isinstance(other, Command) and
-                self.name == other.name and self.items == other.items)
-
-    def __repr__(self):
-        return f"Command(name={self.name}, items={self.items})"
 
+class Command(_Frozen):
+    """Represents a command specification"""
+    __slots__ = ("name", "items", "literal")
+    _fields = ("name", "items")
 
-class Spec:
-    """Complete specification with program name and commands"""
-    def __init__(self, prog: str, commands: List[Command]):
-        self.prog = prog
-        self.commands = commands
+    def __init__(self, name: str, items: Iterable[Item]):
+        items = tuple(items)
+        self._init(name=_intern(name), items=items, literal=first_literal_of(items))
 
-    def __eq__(self, other):
-        return (isinstance(other, Spec) and
-                self.prog == other.prog and self.commands == other.commands)
+    def __repr__(self):
+        return f"Command(name={self.name}, items={list(self.items)})"
+
+
+class Spec(_Frozen):
+    """Complete specification with program name and commands
+
+    `index` maps each command's first literal to the command that dispatch
+    selects for it, and `default` is the command used when no literal
+    matches. Commands sharing a first literal are listed in `collisions`;
+    the earliest one keeps the index entry.
+    """
+    __slots__ = ("prog", "commands", "default", "index", "collisions")
+    _fields = ("prog", "commands")
+
+    def __init__(self, prog: str, commands: Iterable[Command]):
+        commands = tuple(commands)
+        index = {}
+        collisions = {}
+        for cmd in commands:
+            if cmd.literal is None:
+                continue
+            if cmd.literal in index:
+                collisions[cmd.literal] = collisions.get(cmd.literal, (index[cmd.literal],)) + (cmd,)
+            else:
+                index[cmd.literal] = cmd
+        self._init(prog=_intern(prog), commands=commands,
+                   default=commands[0] if commands else None,
+                   index=MappingProxyType(index),
+                   collisions=MappingProxyType(collisions))
+
+    def lookup(self, first_arg: str) -> Optional[Command]:
+        """Return the command selected by a leading argv token"""
+        return self.index.get(first_arg, self.default)
 
     def __repr__(self):
-        return f"Spec(prog={self.prog}, commands={self.commands})"
+        return f"Spec(prog={self.prog}, commands={list(self.commands)})"
@@ -0,0 +1,103 @@
+"""Clyde near-miss suggestions
+
+A `SuggestionIndex` answers "did you mean" queries over a fixed set of
+option names or command literals. It is built once and maps every string
+reachable from a name by deleting up to MAX_DISTANCE characters back to
+the names it came from. Two words within edit distance k share such a
+string with at most k deletions from each, so a query only generates the
+deletions of the typed word and checks edit distance for the few names
+they hit, whatever the number of names.
+
+Runtime errors carry the results on `ArgError.suggestions`; the indexes
+are built on the first miss, so successful parses never pay for them.
+"""
+
+from __future__ import annotations
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Set
+
+# Largest edit distance ever suggested
+MAX_DISTANCE = 2
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """word and every string made by deleting up to depth of its characters"""
+    found = {word}
+    frontier = found
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Edits (insert, delete, substitute, swap adjacent) turning a into b"""
+    if a == b:
+        return 0
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, prev2[j - 2] + 1)
+            cur.append(d)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def max_distance(word: str) -> int:
+    """How far a suggestion for word may be; short words get none"""
+    n = len(word.lstrip("-"))
+    if n <= 2:
+        return 0
+    return 1 if n <= 4 else MAX_DISTANCE
+
+
+class SuggestionIndex:
+    """Deletion index over names for nearest-name lookup"""
+    __slots__ = ("names", "_variants")
+
+    def __init__(self, names: Iterable[str]):
+        self.names = list(dict.fromkeys(names))
+        self._variants: Dict[str, List[str]] = {}
+        for name in self.names:
+            for variant in _deletes(name, MAX_DISTANCE):
+                self._variants.setdefault(variant, []).append(name)
+
+    def suggest(self, word: str, limit: int = 3) -> List[str]:
+        """Names within max_distance(word) of word, closest first"""
+        k = max_distance(word)
+        if not k:
+            return []
+        candidates: Set[str] = set()
+        for variant in _deletes(word, k):
+            names = self._variants.get(variant)
+            if names is not None:
+                candidates.update(names)
+        candidates.discard(word)
+        scored = []
+        for name in candidates:
+            d = edit_distance(word, name)
+            if d <= k:
+                scored.append((d, name))
+        scored.sort()
+        return [name for _, name in scored[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self):
+        return f"SuggestionIndex(names={len(self.names)})"
+
+
+def did_you_mean(suggestions: List[str]) -> str:
+    """"Did you mean X?" text for suggestions, or "" when there are none"""
+    if not suggestions:
+        return ""
+    if len(suggestions) == 1:
+        return f"Did you mean {suggestions[0]}?"
+    return f"Did you mean {', '.join(suggestions[:-1])} or {suggestions[-1]}?"
@@ -2,7 +2,7 @@
 """Clyde demo application"""
 
 import sys
-from clide import Clyde
+from clide import ArgError, Clyde
 
 
 def main():
@@ -28,7 +28,7 @@ def main():
 
     if wants_help:
         try:
-            help_text = Clyde.help_with_docs(usage, docs)
+            help_text = Clyde.help_for(usage, args, docs)
             print(help_text)
             sys.exit(0)
         except Exception as e:
@@ -54,7 +54,10 @@ def main():
 
         sys.exit(0)
     except Exception as e:
-        print(f"Error: {e}\n", file=sys.stderr)
+        print(f"Error: {e}", file=sys.stderr)
+        if isinstance(e, ArgError) and e.hint:
+            print(e.hint, file=sys.stderr)
+        print(file=sys.stderr)
         try:
             help_text = Clyde.help_with_docs(usage, docs)
             print(help_text)
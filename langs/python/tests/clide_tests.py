@@ -1,7 +1,31 @@
 """Clyde tests"""
 
+import io
+import mmap
+import os
+import pickle
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+from unittest import mock
+from pathlib import Path
 from clide import Clyde, ArgError, ParseError
+from clide.argfiles import MappedArgs, read_args_file, read_args_stream
+from clide.batch import parse_many
+from clide.cache import SpecCache, compile_spec
+from clide.codegen import generate_source, load_parser, write_module
+from clide.complete import CompletionServer, complete, query, shim
+from clide.launcher import LaunchServer, launch
+from clide.lazy import LazySpec
+from clide.parser import from_lines
+from clide.registry import Registry
+from clide.runtime import CompiledSpec, ParseResult, choose_command, compile_command, parse_with
+from clide.shell import split
+from clide.suggest import SuggestionIndex, edit_distance, max_distance
 
 
 class TestClyde(unittest.TestCase):
@@ -122,6 +146,803 @@ class TestClyde(unittest.TestCase):
         self.assertIn("--verbose", help_text)
         self.assertIn("serve", help_text)
 
+    def test_compiled_command_matches_parse_with(self):
+        spec = from_lines([
+            "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls] [--root=PATH] <dir:PATH>",
+        ])
+        cmd = spec.commands[0]
+        compiled = compile_command(cmd)
+
+        self.assertEqual(sorted(compiled.options),
+                         ["--port", "--root", "--tls", "--verbose", "-v"])
+        self.assertEqual(compiled.positionals[0][0], "dir")
+
+        argv = ["serve", "-v", "--port=9000", "/app"]
+        self.assertEqual(parse_with(compiled, argv), parse_with(cmd, argv))
+
+    def test_invalid_default_reported_when_used(self):
+        parse = Clyde.from_usage_lines(["Usage: tool [--port=INT:abc]"])
+
+        result = parse(["--port", "1"])
+        self.assertEqual(result.options, [("--port", ["1"])])
+
+        with self.assertRaises(ArgError) as context:
+            parse([])
+        self.assertIn("Expected INT", str(context.exception))
+
+    def test_dispatch_index_and_collisions(self):
+        spec = from_lines([
+            "Usage: git [--bare] <dir:PATH>",
+            "Usage: git clone <url:STR>",
+            "Usage: git clone --depth=INT <url:STR>",
+            "Usage: git push",
+        ])
+
+        self.assertIs(choose_command(spec, ["push"]), spec.commands[3])
+        self.assertIs(choose_command(spec, ["clone", "x"]), spec.commands[1])
+        self.assertIs(choose_command(spec, ["nope"]), spec.default)
+        self.assertIs(choose_command(spec, []), spec.commands[0])
+
+        self.assertEqual(list(spec.collisions), ["clone"])
+        self.assertEqual(spec.collisions["clone"], spec.commands[1:3])
+
+    def test_spec_cache_memory_and_disk(self):
+        usage = ["Usage: tool [--n=INT:1] <dir:PATH>"]
+        calls = []
+
+        def counting_from_lines(lines):
+            calls.append(lines)
+            return from_lines(lines)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SpecCache(maxsize=1, directory=tmp, compile_fn=counting_from_lines)
+            first = cache.get(usage)
+            self.assertIs(cache.get(usage), first)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(os.listdir(tmp)), 1)
+
+            # A fresh cache (a new process) loads from disk without compiling
+            fresh = SpecCache(directory=tmp, compile_fn=counting_from_lines)
+            self.assertEqual(fresh.get(usage), first)
+            self.assertEqual(len(calls), 1)
+
+            cache.get(["Usage: other"])
+            self.assertEqual(cache.memory.cache_info()["currsize"], 1)
+
+    def test_parse_many_returns_errors_as_values(self):
+        usage = ["Usage: job [--retries=INT:0] <name:STR>"]
+        argvs = [["a"], ["--retries", "x", "b"], ["--retries=3", "c"]] * 5
+
+        serial = Clyde.parse_many(usage, argvs)
+        self.assertEqual(len(serial), 15)
+        self.assertEqual(serial[0].positionals, [("name", "a")])
+        self.assertIsInstance(serial[1], ArgError)
+        self.assertEqual(serial[2].options, [("--retries", ["3"])])
+
+        pooled = list(Clyde.iter_parse(usage, iter(argvs), workers=2, chunksize=4))
+        self.assertEqual([type(r) for r in pooled], [type(r) for r in serial])
+        self.assertEqual(pooled[2], serial[2])
+        self.assertEqual(str(pooled[1]), str(serial[1]))
+
+        # Workers rebuild the caller's parser with all of its settings
+        parser = Clyde.from_usage_lines(["Usage: job [--id=INT+]"], max_repeats=1)
+        argvs = [["--id=1"], ["--id=1", "--id=2"]]
+        serial = parse_many(parser, argvs)
+        pooled = parse_many(parser, argvs, workers=2, chunksize=1)
+        self.assertEqual([type(r) for r in pooled], [ParseResult, ArgError])
+        self.assertEqual([str(r) for r in pooled], [str(r) for r in serial])
+        with self.assertRaises(ValueError):
+            parse_many(Clyde.from_usage_lines(["Usage: job [--id=INT+]"], on_repeat=print),
+                       argvs, workers=2)
+
+        parser = Clyde.from_usage_lines(["Usage: job [--json|--yaml] <dir:PATH>"], strict=True)
+        argvs = [["--json", "/a"], ["--json", "--yaml", "/a"]]
+        serial = parse_many(parser, argvs)
+        pooled = parse_many(parser, argvs, workers=2, chunksize=1)
+        self.assertEqual([type(r) for r in pooled], [ParseResult, ArgError])
+        self.assertEqual([str(r) for r in pooled], [str(r) for r in serial])
+
+    def test_registry_dispatch(self):
+        registry = Registry()
+        tools = {}
+        for n in range(300):
+            usage = [f"Usage: tool{n} deploy [--force] <env:STR>",
+                     f"Usage: tool{n} status [--json]",
+                     f"Usage: tool{n} <query:STR>"]
+            registry.add(usage)
+            tools[f"tool{n}"] = Clyde.from_usage_lines(usage)
+
+        for argv in (["tool7", "deploy", "prod"], ["tool299", "status", "--json"],
+                     ["tool0", "hello"]):
+            prog, result = registry.parse(argv)
+            self.assertEqual(prog, argv[0])
+            self.assertEqual(result, tools[argv[0]](argv[1:]))
+        with self.assertRaisesRegex(ArgError, "Missing positional: env"):
+            registry.parse(["tool5"])
+        self.assertEqual(registry.parse_string("tool3 deploy 'us east'")[1].positional("env"),
+                         "us east")
+
+        registry.add(["Usage: tool7 rollback <env:STR>"])
+        self.assertEqual(registry.parse(["tool7", "rollback", "prod"])[1].command, "rollback")
+        self.assertEqual(registry.parse(["tool7", "deploy"])[1].positional("env"), "deploy")
+        self.assertTrue(registry.remove("tool7"))
+        self.assertFalse(registry.remove("tool7"))
+        self.assertEqual(len(registry), 299)
+        with self.assertRaisesRegex(ArgError, "Unknown program: tool7"):
+            registry.parse(["tool7", "rollback", "prod"])
+
+    def test_lazy_subcommands(self):
+        loads = []
+
+        def source(lines):
+            return lambda: loads.append(lines[0]) or lines
+
+        cli = LazySpec("ops")
+        cli.register("deploy", source(["Usage: ops deploy [--force] <env:STR>"]), summary="Deploy")
+        cli.register("remote add", source(["Usage: ops remote add <name:STR> <url:STR>"]),
+                     summary="Add a remote")
+        cli.register("remote rm", source(["Usage: ops remote rm <name:STR>"]))
+        cli.register("broken", source(["Usage: ops other <x:STR>"]))
+        cli.register("remote set", source(["Usage: ops remote remove <x:STR>"]))
+        cli.register("remote show", source(["Usage: ops remote [-v] show <name:STR>"]))
+
+        help_text = cli.help()
+        self.assertIn("  remote add ...\n", help_text)
+        self.assertIn("  remote add  -  Add a remote\n", help_text)
+        self.assertEqual(loads, [])
+
+        result = cli.parse(["remote", "add", "origin", "git@host"])
+        self.assertEqual(result.command, "remote add")
+        self.assertEqual(result.positionals, [("name", "origin"), ("url", "git@host")])
+        self.assertEqual(cli.loaded(), ["remote add"])
+        self.assertEqual(cli.parse(["remote", "add", "a", "b"]).command, "remote add")
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cli.choose_command(["deploy", "prod"]).name, "deploy")
+        self.assertIn("[--force]", cli.help_for(["deploy"]))
+
+        for argv, message in [(["remote"], "Incomplete command: remote (expected add|rm|set|show)"),
+                              (["status"], "Unknown command: status"), ([], "Missing command")]:
+            with self.assertRaises(ArgError) as ctx:
+                cli.parse(argv)
+            self.assertEqual(ctx.exception.message, message)
+        for argv in (["broken", "x"], ["remote", "set", "x"]):
+            with self.assertRaises(ParseError):
+                cli.parse(argv)
+        self.assertEqual(cli.parse(["remote", "show", "origin"]).command, "remote show")
+
+    def test_suggestions(self):
+        usage = [
+            "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls] [--root=PATH] <dir:PATH>",
+            "Usage: mytool init <path:PATH>",
+            "Usage: mytool status",
+        ]
+        for strict in (False, True):
+            parse = Clyde.from_usage_lines(usage, strict=strict)
+            with self.assertRaises(ArgError) as ctx:
+                parse(["serve", "--rort", "1", "/app"])
+            self.assertEqual(ctx.exception.message, "Unknown option: --rort")
+            self.assertEqual(ctx.exception.suggestions, ["--port", "--root"])
+            self.assertEqual(ctx.exception.hint, "Did you mean --port or --root?")
+        with self.assertRaises(ArgError) as ctx:
+            Clyde.from_usage_lines(usage)(["statsu", "x"])
+        self.assertEqual(ctx.exception.suggestions, ["status"])
+        self.assertEqual(pickle.loads(pickle.dumps(ctx.exception)).hint, "Did you mean status?")
+        with self.assertRaises(ArgError) as ctx:
+            Clyde.from_usage_lines(usage)(["serve", "-x", "/app"])
+        self.assertEqual(ctx.exception.suggestions, [])
+
+        cli = LazySpec("ops")
+        for path in ("remote add", "remote remove", "deploy"):
+            cli.register(path, [f"Usage: ops {path} <x:STR>"])
+        for argv, expected in [(["remote", "remvoe"], ["remove"]), (["dpeloy"], ["deploy"])]:
+            with self.assertRaises(ArgError) as ctx:
+                cli.parse(argv)
+            self.assertEqual(ctx.exception.suggestions, expected)
+
+        rng = random.Random(25)
+        names = ["".join(rng.choice("abcde") for _ in range(rng.randint(1, 7))) for _ in range(300)]
+        index = SuggestionIndex(names)
+        for _ in range(300):
+            word = "".join(rng.choice("abcdef") for _ in range(rng.randint(1, 7)))
+            k = max_distance(word)
+            expected = sorted((edit_distance(word, n), n) for n in set(names)
+                              if n != word and edit_distance(word, n) <= k)
+            self.assertEqual(index.suggest(word, limit=len(names)), [n for _, n in expected])
+
+    def test_shell_split_matches_shlex(self):
+        rng = random.Random(20)
+        alphabet = "ab \t\n\r'\"\\\x0b\xa0é$"
+        for _ in range(20000):
+            line = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 16)))
+            try:
+                expected = shlex.split(line)
+            except ValueError:
+                with self.assertRaises(ArgError, msg=repr(line)):
+                    split(line)
+            else:
+                self.assertEqual(split(line), expected, repr(line))
+
+        with self.assertRaisesRegex(ArgError, "Unterminated double quote at offset 4"):
+            split('run "a\\"')
+
+    def test_parse_string(self):
+        usage = ["Usage: bot deploy [--note=STR] <env:STR> <hosts:STR>..."]
+        line = r'''deploy --note 'it'"'"'s "fine"' prod web\ 1 "db \\2\""'''
+        expected = Clyde.from_usage_lines(usage)(shlex.split(line))
+        self.assertEqual(Clyde.parse_string(usage, line), expected)
+        self.assertEqual(expected.get("--note"), 'it\'s "fine"')
+        self.assertEqual(expected.positional("hosts"), ["web 1", 'db \\2"'])
+
+        lines = [line, "deploy 'prod", "deploy prod a"] * 3
+        results = Clyde.parse_strings(usage, lines)
+        self.assertEqual(results[0], expected)
+        self.assertIsInstance(results[1], ArgError)
+        pooled = Clyde.parse_strings(usage, lines, workers=2, chunksize=2)
+        self.assertEqual([str(r) for r in pooled], [str(r) for r in results])
+
+    def test_typed_results(self):
+        usage = [
+            "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls] [--root=PATH] <dir:PATH>",
+            "Usage: mytool init [--force=BOOL:false] <path:PATH>",
+        ]
+
+        parse = Clyde.from_usage_lines(usage, typed=True)
+        result = parse(["serve", "--tls", "--root=/srv", "/app"])
+        self.assertEqual(result.options, [
+            ("--tls", [True]),
+            ("--root", [Path("/srv")]),
+            ("-v", [False]),
+            ("--verbose", [False]),
+            ("--port", [8080]),
+        ])
+        self.assertEqual(result.positionals, [("dir", Path("/app"))])
+
+        result = parse(["init", "--force", "TRUE", "proj"])
+        self.assertEqual(result.options, [("--force", [True])])
+
+        with self.assertRaises(ArgError):
+            parse(["serve", "--port=http", "/app"])
+
+    def test_result_accessors(self):
+        usage = ["Usage: build [-q] [--include=PATH+] [--jobs=INT:4] <dir:PATH>"]
+
+        parse = Clyde.from_usage_lines(usage)
+        result = parse(["--include", "src", "-q", "--include=lib", "project"])
+
+        self.assertEqual(result.get_all("--include"), ["src", "lib"])
+        self.assertEqual(result.get("--include"), "lib")
+        self.assertEqual(result.get("--jobs"), "4")
+        self.assertIsNone(result.get("--missing"))
+        self.assertEqual(result.get_all("--missing"), [])
+        self.assertTrue(result.flag("-q"))
+        self.assertEqual(result.positional("dir"), "project")
+        self.assertEqual(result.positional("nope", None), None)
+        with self.assertRaises(KeyError):
+            result.positional("nope")
+
+        self.assertEqual(result.options, [
+            ("--include", ["src", "lib"]),
+            ("-q", ["true"]),
+            ("--jobs", ["4"]),
+        ])
+        self.assertFalse(hasattr(result, "__dict__"))
+
+    def test_spec_is_frozen_hashable_and_interned(self):
+        usage = [
+            "Usage: mytool [-v|--verbose] serve [--port=INT:8080] <dir:PATH>",
+            "Usage: mytool init <path:PATH>",
+        ]
+        spec = from_lines(usage)
+        again = from_lines(list(usage))
+
+        self.assertEqual(spec, again)
+        self.assertEqual(hash(spec), hash(again))
+        self.assertEqual(len({spec, again}), 1)
+        self.assertEqual({spec: "cached"}[again], "cached")
+
+        with self.assertRaises(AttributeError):
+            spec.prog = "other"
+        with self.assertRaises(AttributeError):
+            spec.commands[0].items[0].group.atoms[0].long = "--loud"
+        self.assertFalse(hasattr(spec.commands[0], "__dict__"))
+
+        verbose = spec.commands[0].items[0].group.atoms[1].long
+        self.assertIs(verbose, again.commands[0].items[0].group.atoms[1].long)
+
+        restored = pickle.loads(pickle.dumps(spec))
+        self.assertEqual(restored, spec)
+        self.assertIs(restored.lookup("init"), restored.commands[1])
+
+    def test_profiler_counts_phases_and_errors(self):
+        usage = ["Usage: mytool serve [--port=INT:8080] [--tls] <dir:PATH>"]
+        parse = Clyde.from_usage_lines(usage)
+        self.assertFalse(parse.profiler.enabled)
+        parse(["serve", "/app"])
+        self.assertEqual(parse.stats()["parses"], 0)
+
+        parse.profiler.enable()
+        parse(["serve", "--port", "1", "/app"])
+        for argv in (["serve", "--bogus"], ["serve", "--bogus", "x"], ["serve", "--port=x"]):
+            with self.assertRaises(ArgError):
+                parse(argv)
+
+        stats = parse.stats()
+        self.assertEqual(stats["parses"], 1)
+        self.assertEqual(stats["errors"], {"unknown_option": 2, "bad_int": 1})
+        self.assertEqual(stats["unknown_options"], {"--bogus": 2})
+        self.assertGreater(stats["seconds"]["compile"], 0)
+        self.assertGreater(stats["seconds"]["tokens"], 0)
+        self.assertGreater(stats["seconds"]["convert"], 0)
+
+        text = parse.profiler.to_prometheus()
+        self.assertIn('clide_parses_total{prog="mytool"} 1', text)
+        self.assertIn('clide_unknown_option_total{prog="mytool",option="--bogus"} 2', text)
+
+        # Result-cache hits still count as parses
+        cached = Clyde.from_usage_lines(usage, cache_size=4)
+        cached.profiler.enable()
+        for _ in range(3):
+            cached(["serve", "/app"])
+        stats = cached.stats()
+        self.assertEqual((stats["parses"], stats["cache_hits"]), (3, 2))
+        self.assertIn('clide_cache_hits_total{prog="mytool"} 2', cached.profiler.to_prometheus())
+
+    def test_parse_path_imports_stay_lazy(self):
+        script = (
+            "import sys\n"
+            "import clide\n"
+            "assert set(m for m in sys.modules if m.startswith('clide')) == {'clide'}\n"
+            "parse = clide.Clyde.from_usage_lines(['Usage: tool [--n=INT:1] <dir:PATH>'])\n"
+            "parse(['/tmp'])\n"
+            "cold = ['typing', 'clide.help', 'clide.batch', 'concurrent.futures']\n"
+            "print(','.join(m for m in cold if m in sys.modules))\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        out = subprocess.run([sys.executable, "-c", script], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        self.assertEqual(out.strip(), "")
+
+        import clide
+        self.assertIs(clide.Type, clide.spec.Type)
+        self.assertIn("render", dir(clide))
+
+    def test_help_for_single_command(self):
+        usage = [
+            "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls] [--root=PATH] <dir:PATH>",
+            "Usage: mytool init <path:PATH>",
+        ]
+        docs = [("init", "Initialize a project directory"), ("<path:PATH>", "Project directory")]
+
+        help_text = Clyde.help_for(usage, ["init", "--help"], docs)
+        self.assertEqual(help_text, (
+            "Usage:\n"
+            "  init <path:PATH> \n"
+            "\n"
+            "Options & Arguments:\n"
+            "  init         -  Initialize a project directory\n"
+            "  <path:PATH>  -  Project directory\n"
+        ))
+        self.assertIs(Clyde.help_for(usage, ["init"], docs), help_text)
+        self.assertEqual(Clyde.help_for(usage, ["--help"], docs),
+                         Clyde.help_with_docs(usage, docs))
+
+    def test_leftovers_are_a_view_over_argv(self):
+        parse = Clyde.from_usage_lines(["Usage: tool [--n=INT:1] <dir:PATH>"])
+        argv = ["--", "/work"] + [f"f{i}" for i in range(1000)]
+
+        leftovers = parse(argv).leftovers
+        self.assertEqual(len(leftovers), 1000)
+        self.assertEqual(leftovers[0], "f0")
+        self.assertEqual(leftovers[-1], "f999")
+        self.assertEqual(leftovers[10:13], ["f10", "f11", "f12"])
+        self.assertEqual(leftovers, argv[2:])
+        self.assertIn("f500", leftovers)
+        with self.assertRaises(TypeError):
+            leftovers[0] = "x"
+        self.assertEqual(pickle.loads(pickle.dumps(leftovers)), argv[2:])
+        self.assertEqual(parse(("/work",)).leftovers, [])
+
+    def test_variadic_positionals(self):
+        usage = ["Usage: cp [-r] <dest:PATH> <files:INT>..."]
+        parse = Clyde.from_usage_lines(usage, typed=True)
+
+        result = parse(["/d", "1", "-r", "2", "--", "-3"])
+        self.assertEqual(result.positional("files"), [1, 2, -3])
+        self.assertEqual(result.leftovers, [])
+        with self.assertRaises(ArgError):
+            parse(["/d"])
+        with self.assertRaises(ParseError):
+            Clyde.from_usage_lines(["Usage: cp <files:PATH>... <dest:PATH>"])
+        optional = Clyde.from_usage_lines(["Usage: ls [<paths:PATH>...]"])
+        self.assertEqual(optional([]).positional("paths"), [])
+        self.assertIn("<files:INT>...", Clyde.help_of(usage))
+
+        streaming = CompiledSpec(compile_spec(usage), typed=True, stream=True)
+        files = streaming(["-r", "/d", "1", "2", "oops"]).positional("files")
+        self.assertEqual((next(files), next(files)), (1, 2))
+        with self.assertRaises(ArgError):
+            next(files)
+        self.assertEqual(list(streaming(["/d", "--", "-1"]).positional("files")), [-1])
+
+    def test_bulk_repeatable_options(self):
+        usage = ["Usage: job [--id=INT+] [--include=PATH+]"]
+        argv = [f"--id={n}" for n in range(5000)] + ["--include", "a", "--include=b"]
+
+        result = Clyde.from_usage_lines(usage, typed=True)(argv)
+        self.assertEqual(result.get_all("--id").typecode, "q")
+        self.assertEqual(list(result.get_all("--id")), list(range(5000)))
+        self.assertEqual(result.get("--id"), 4999)
+        self.assertEqual(result.get_all("--include"), [Path("a"), Path("b")])
+        overflow = Clyde.from_usage_lines(usage, typed=True)(["--id=1", f"--id={2 ** 70}"])
+        self.assertEqual(overflow.get_all("--id"), [1, 2 ** 70])
+
+        with self.assertRaises(ArgError) as context:
+            Clyde.from_usage_lines(usage, max_repeats=100)(argv)
+        self.assertIn("Too many values for --id", str(context.exception))
+
+        seen = []
+        streamed = Clyde.from_usage_lines(usage, on_repeat=lambda name, val: seen.append(val))
+        result = streamed(argv)
+        self.assertEqual(len(seen), 5002)
+        self.assertEqual(result.get_all("--id"), ["4999"])
+        self.assertEqual(result.get("--include"), "b")
+
+    def test_result_cache(self):
+        usage = ["Usage: bot deploy [--force] <env:STR> <hosts:STR>..."]
+        plain = Clyde.from_usage_lines(usage)
+        parse = Clyde.from_usage_lines(usage, cache_size=2)
+        argv = ["deploy", "--force", "prod", "a", "b"]
+
+        first = parse(argv)
+        self.assertIs(parse(list(argv)), first)
+        self.assertEqual(first, plain(argv))
+        self.assertEqual(plain(argv), first)
+        self.assertEqual(first.positional("hosts"), ("a", "b"))
+        self.assertEqual(first.get_all("--force"), ("true",))
+        with self.assertRaises(AttributeError):
+            first.command = "other"
+        self.assertEqual(pickle.loads(pickle.dumps(first)), first)
+
+        parse(["deploy", "prod", "a"])
+        parse(["deploy", "dev", "a"])
+        self.assertEqual(parse.cache_info(), {"hits": 1, "misses": 3, "maxsize": 2, "currsize": 2})
+        self.assertIsNot(parse(argv), first)
+        self.assertTrue(parse.cache_evict(argv))
+        self.assertFalse(parse.cache_evict(argv))
+        with self.assertRaises(ArgError):
+            parse(["deploy"])
+        self.assertEqual(parse.cache_info()["currsize"], 1)
+        parse.cache_clear()
+        self.assertEqual(parse.cache_info()["hits"], 0)
+        with self.assertRaises(ValueError):
+            Clyde.from_usage_lines(usage, stream=True, cache_size=8)
+
+        # A shared parser stays consistent while threads evict each other's entries
+        shared = Clyde.from_usage_lines(usage, cache_size=2)
+        errors = []
+
+        def hammer(n):
+            try:
+                for i in range(2000):
+                    shared(["deploy", f"env{(n + i) % 5}", "h"])
+            except Exception as e:
+                errors.append(e)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=hammer, args=(n,)) for n in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        info = shared.cache_info()
+        self.assertEqual((info["hits"] + info["misses"], info["currsize"]), (8000, 2))
+
+    def test_argument_files(self):
+        usage = ["Usage: tar [--level=INT:1] <archive:PATH> <files:PATH>..."]
+        parse = Clyde.from_usage_lines(usage, argfiles=True)
+        # Enough paths to span several decode blocks
+        files = [f"dir/file {n}.txt" for n in range(10000)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            lines = os.path.join(tmp, "args.txt")
+            with open(lines, "w") as f:
+                f.write("--level\r\n9\n" + "\n".join(files) + "\n")
+            nul = os.path.join(tmp, "args.bin")
+            with open(nul, "wb") as f:
+                f.write(b"".join(name.encode() + b"\0" for name in files))
+
+            inline = parse(["out.tar", "--level", "9"] + files)
+            self.assertEqual(parse(["out.tar", "@" + lines]), inline)
+            self.assertEqual(parse(["out.tar", "--level=9", "--args-from=" + nul]), inline)
+
+            mapped = read_args_file(nul)
+            self.assertEqual(len(mapped), 10000)
+            self.assertEqual((mapped[9999], mapped[3], mapped[-2], mapped[5000]),
+                             (files[9999], files[3], files[9998], files[5000]))
+            self.assertEqual(list(read_args_stream(io.BytesIO(b"a\0\0b"))), ["a", "", "b"])
+            blank = os.path.join(tmp, "blank.txt")
+            Path(blank).write_text("a\n\nb\n")
+            self.assertEqual(list(read_args_file(blank)), ["a", "", "b"])
+
+            # Mapped files are released once the parse no longer needs them
+            with mock.patch("clide.argfiles._MAP_MIN", 0), \
+                    mock.patch.object(MappedArgs, "close", autospec=True,
+                                      side_effect=MappedArgs.close) as close:
+                self.assertEqual(parse(["out.tar", "@" + lines]), inline)
+                self.assertEqual(close.call_count, 1)
+                with read_args_file(nul) as mapped:
+                    self.assertEqual(mapped[5000], files[5000])
+                self.assertTrue(mapped._buf.closed)
+
+            # A seeked stdin is read from its position, mapped or not
+            with open(nul, "rb") as f:
+                skip = len(files[0]) + 1
+                for limit in (1 << 40, 0):
+                    f.seek(skip)
+                    with mock.patch("clide.argfiles._MAP_MIN", limit):
+                        args = read_args_stream(f)
+                    self.assertEqual((len(args), args[0]), (9999, files[1]))
+                f.seek(0)
+                with mock.patch("clide.argfiles._MAP_MIN", 0):
+                    args = read_args_stream(f)
+                self.assertIsInstance(args._buf, mmap.mmap)
+                self.assertEqual((len(args), args[0], f.read()), (10000, files[0], b""))
+                args.close()
+
+            with self.assertRaises(ArgError):
+                parse(["out.tar", "@" + os.path.join(tmp, "missing")])
+            self.assertEqual(parse(["x", "--", "@y"]).positional("files"), ["@y"])
+
+    def test_completion(self):
+        usage = [
+            "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls=BOOL] [--root=PATH] <dir:PATH>",
+            "Usage: mytool init <path:PATH>",
+        ]
+        spec = compile_spec(usage)
+
+        self.assertEqual(complete(spec, ["s"], 0).candidates, ["serve"])
+        self.assertEqual(complete(spec, ["serve", "--"], 1).candidates,
+                         ["--port", "--root", "--tls", "--verbose"])
+        self.assertEqual(complete(spec, ["serve", "-v", "--tls", ""], 3).candidates,
+                         ["true", "false"])
+        self.assertEqual(complete(spec, ["serve", "--tls=f"], 1).candidates, ["--tls=false"])
+        self.assertEqual(complete(spec, ["serve", "--port", ""], 2).hint, "INT")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            os.mkdir(os.path.join(tmp, "src"))
+            open(os.path.join(tmp, "setup.py"), "w").close()
+            result = complete(spec, ["serve", "s"], 1, cwd=tmp)
+            self.assertEqual(result.candidates, ["setup.py", "src/"])
+            self.assertEqual(result.hint, "<dir:PATH>")
+
+            server = CompletionServer(os.path.join(tmp, "complete.sock"))
+            server.add(usage)
+            # The process-wide umask is left alone while binding
+            with mock.patch("os.umask") as umask:
+                server.start()
+            umask.assert_not_called()
+            try:
+                self.assertEqual(query(server.socket_path, "mytool", ["serve", "--r"], 1),
+                                 ["--root"])
+                self.assertEqual(query(server.socket_path, "nosuchtool", ["x"], 0), [])
+                self.assertEqual(os.stat(server.socket_path).st_mode & 0o777, 0o600)
+                # Staged in a private directory that is removed afterwards
+                self.assertFalse([n for n in os.listdir(tmp) if n.startswith(".clide-")])
+            finally:
+                server.shutdown()
+
+            # Only a stale socket is replaced, never another file
+            precious = os.path.join(tmp, "precious")
+            Path(precious).write_text("keep")
+            with self.assertRaises(FileExistsError):
+                CompletionServer(precious).start()
+            self.assertEqual(Path(precious).read_text(), "keep")
+        self.assertIn("complete -F _clide_complete_mytool mytool",
+                      shim("bash", "mytool", "/tmp/complete.sock"))
+
+    def test_launcher(self):
+        usage = ["Usage: mytool serve [--port=INT:8080] <dir:PATH>"]
+
+        def handler(result):
+            if result.positional("dir") == "/fail":
+                return "deploy failed"
+            print(result.positional("dir"), result.get("--port"), os.getcwd(), os.environ["TOOL_MODE"])
+            return 3
+
+        with tempfile.TemporaryDirectory() as tmp:
+            server = LaunchServer(os.path.join(tmp, "launch.sock"),
+                                  Clyde.from_usage_lines(usage), handler)
+            server.start()
+            try:
+                with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+                    stdio = (0, out.fileno(), err.fileno())
+                    env = {"TOOL_MODE": "ci"}
+                    code = launch(server.socket_path, ["serve", "--port", "9", "/app"],
+                                  env=env, cwd=tmp, stdio=stdio)
+                    self.assertEqual(code, 3)
+                    self.assertEqual(launch(server.socket_path, ["serve"], env=env, stdio=stdio), 2)
+                    # A non-int return value exits like sys.exit(value)
+                    self.assertEqual(launch(server.socket_path, ["serve", "/fail"], env=env,
+                                            stdio=stdio), 1)
+                    out.seek(0)
+                    err.seek(0)
+                    self.assertEqual(out.read().decode(), f"/app 9 {os.path.realpath(tmp)} ci\n")
+                    self.assertEqual(err.read().decode(),
+                                     "mytool: Missing positional: dir\ndeploy failed\n")
+                self.assertEqual(os.stat(server.socket_path).st_mode & 0o777, 0o600)
+            finally:
+                server.shutdown()
+
+
+FUZZ_USAGE = [
+    "Usage: mytool [-v|--verbose] serve [--port=INT:8080] [--tls] [--root=PATH] <dir:PATH>",
+    "Usage: mytool init [--force=BOOL:false] [--name=STR] <path:PATH> <n:INT:3>",
+    "Usage: mytool bad [--level=INT:high] [--tag=STR+] [<count:INT:x>]",
+    "Usage: mytool [-q] <target:STR>",
+    "Usage: mytool cp [-r] [--id=INT+] <dest:PATH> <files:INT>...",
+    "Usage: mytool rm [--n=INT:2] [<paths:STR:x>...]",
+    "Usage: mytool ls [<paths:BOOL>...]",
+]
+
+FUZZ_WORDS = [
+    "serve", "init", "bad", "--", "-v", "--verbose", "--port", "--port=1", "--tls",
+    "--tls=no", "--root", "--force", "--force=TRUE", "--force=maybe", "--name=x",
+    "--level", "--level=7", "--tag", "--tag=a", "-q", "-x", "--bogus", "-", "12",
+    "abc", "/app", "true", "False", "", "=", "cp", "rm", "ls", "-r", "--n=4",
+]
+
+
+VARIADIC_WORDS = ["cp", "rm", "ls", "--", "-r", "--n=4", "--n", "7", "x", "true", "-q", "/d",
+                  "--id=5", "--id", "--id=99999999999999999999"]
+
+
+def outcome(parse, argv):
+    try:
+        return parse(argv)
+    except ArgError as e:
+        return ("error", e.message)
+
+
+def fuzz_corpus(seed, count, words=FUZZ_WORDS):
+    rng = random.Random(seed)
+    return [[rng.choice(words) for _ in range(rng.randint(0, 8))]
+            for _ in range(count)]
+
+
+class TestCodegen(unittest.TestCase):
+
+    def test_generated_parser_matches_runtime(self):
+        spec = from_lines(FUZZ_USAGE)
+        for typed in (False, True):
+            generated = load_parser(spec, typed=typed)
+            interpreted = CompiledSpec(spec, typed=typed)
+            for argv in fuzz_corpus(1234 + typed, 3000):
+                self.assertEqual(outcome(generated, argv), outcome(interpreted, argv), argv)
+            for argv in fuzz_corpus(77 + typed, 2000, VARIADIC_WORDS):
+                self.assertEqual(outcome(generated, argv), outcome(interpreted, argv), argv)
+
+    def test_generated_errors_carry_suggestions(self):
+        def suggested(parse, argv):
+            try:
+                return parse(argv)
+            except ArgError as e:
+                return ("error", e.message, e.suggestions)
+
+        spec = from_lines(FUZZ_USAGE)
+        generated = load_parser(spec)
+        interpreted = CompiledSpec(spec)
+        words = FUZZ_WORDS + ["--prot", "--rot", "--verbsoe", "--forc", "srve", "inti", "cpp"]
+        hits = 0
+        for argv in fuzz_corpus(2025, 2000, words):
+            expected = suggested(interpreted, argv)
+            self.assertEqual(suggested(generated, argv), expected, argv)
+            hits += isinstance(expected, tuple) and bool(expected[2])
+        self.assertGreater(hits, 50)
+        with self.assertRaises(ArgError) as ctx:
+            generated(["serve", "--prot=1", "/app"])
+        self.assertEqual(ctx.exception.hint, "Did you mean --port?")
+
+    def test_write_importable_module(self):
+        spec = from_lines(FUZZ_USAGE)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mytool_parser.py")
+            write_module(spec, path)
+            namespace = {}
+            with open(path) as f:
+                exec(compile(f.read(), path, "exec"), namespace)
+        self.assertEqual(namespace["parse"](["serve", "/app"]),
+                         CompiledSpec(spec)(["serve", "/app"]))
+        self.assertIn("def _parse_0(argv):", generate_source(spec))
+
+
+class TestStrict(unittest.TestCase):
+
+    def test_strict_accepts_a_subset_of_default(self):
+        spec = from_lines(FUZZ_USAGE)
+        default = CompiledSpec(spec)
+        strict = CompiledSpec(spec, strict=True)
+        literals = {"serve", "init", "bad", "cp", "rm", "ls"}
+        accepted = 0
+        for argv in fuzz_corpus(21, 3000) + fuzz_corpus(22, 2000, VARIADIC_WORDS):
+            result = outcome(strict, argv)
+            # The default loop swallows a repeated literal that strict takes as a value
+            repeated = any(argv.count(word) > 1 for word in literals)
+            if isinstance(result, tuple) or repeated:
+                continue
+            accepted += 1
+            self.assertEqual(result, outcome(default, argv), argv)
+        self.assertGreater(accepted, 50)
+
+    def test_usage_structure_is_enforced(self):
+        usage = ["Usage: tool [-v|--verbose] serve [--json|--yaml] <dir:PATH>",
+                 "Usage: tool remote [add|rm] --name=STR <url:STR> [<extra:STR>...]"]
+        parse = Clyde.from_usage_lines(usage, strict=True)
+
+        self.assertEqual(parse(["serve", "-v", "--verbose", "--json", "/a"]).flag("--json"), True)
+        result = parse(["remote", "add", "--name", "origin", "u", "e"])
+        self.assertEqual(result.positionals, [("url", "u"), ("extra", ["e"])])
+        self.assertEqual(parse(["remote", "--name=o", "--", "add"]).positional("url"), "add")
+
+        for argv, message in [
+            (["/a", "serve"], "Unexpected argument: /a (expected serve)"),
+            (["serve", "--json", "--yaml", "/a"], "--yaml cannot be used with --json"),
+            (["remote", "u"], "Missing option: --name"),
+            (["remote", "--name=o", "add", "u", "e", "add"], None),
+        ]:
+            if message is None:
+                self.assertEqual(parse(argv).positional("extra"), ["e", "add"])
+                continue
+            with self.assertRaises(ArgError) as ctx:
+                parse(argv)
+            self.assertEqual(ctx.exception.message, message)
+
+        default = Clyde.from_usage_lines(usage)
+        self.assertEqual(default(["/a", "serve"]).positional("dir"), "/a")
+        with self.assertRaises(ValueError):
+            Clyde.from_usage_lines(usage, strict=True, stream=True)
+
+
+class TestIncremental(unittest.TestCase):
+
+    def test_incremental_parser_matches_runtime(self):
+        spec = from_lines(FUZZ_USAGE)
+        for typed in (False, True):
+            parser = CompiledSpec(spec, typed=typed)
+
+            def incremental(argv):
+                return parser.incremental().feed_all(argv).finish()
+
+            for argv in fuzz_corpus(99 + typed, 3000):
+                self.assertEqual(outcome(incremental, argv), outcome(parser, argv), argv)
+            for argv in fuzz_corpus(55 + typed, 2000, VARIADIC_WORDS):
+                self.assertEqual(outcome(incremental, argv), outcome(parser, argv), argv)
+
+    def test_incremental_state_and_fork(self):
+        parser = Clyde.from_usage_lines(["Usage: mytool serve [--port=INT:8080] [--tag=STR+] <dir:PATH>"])
+        base = parser.incremental().feed_all(["serve", "--port"])
+        state = base.state()
+        self.assertEqual((state.command, state.pending), ("serve", "--port"))
+        self.assertFalse(state.complete)
+
+        base.feed("80")
+        base.feed("--tag=a")
+        self.assertEqual(base.state().next_positional[0], "dir")
+        with self.assertRaises(ArgError):
+            base.fork().feed("--port=x")
+
+        trial = base.fork()
+        trial.feed_all(["--tag=b", "/app"])
+        self.assertTrue(trial.state().complete)
+        self.assertEqual(trial.finish().get_all("--tag"), ["a", "b"])
+        self.assertEqual(base.state().missing, ("dir",))
+        self.assertEqual(base.feed_all(["/srv"]).finish().get_all("--tag"), ["a"])
+
 
 if __name__ == "__main__":
     unittest.main()